@@ -0,0 +1,124 @@
+# 画像と音の読み込み
+#
+# 画像と音のデコードは別のスレッドで先に始めておき、使うときに待つ。
+# 時間のかかる音楽は別の1つのスレッドで順にデコードし、効果音を待たせない。
+# preload していない音は初めて使うときに一度だけ読み込む。
+from concurrent.futures import ThreadPoolExecutor
+from os import path
+from time import perf_counter
+
+import pygame as pg
+
+from settings import *
+from sprites import convert_image
+
+
+class NullSound:
+    """ headlessのときの音 (何もしない) """
+
+    def play(self, *args, **kwargs):
+        pass
+
+    def stop(self):
+        pass
+
+    def set_volume(self, value):
+        pass
+
+
+class AssetManager:
+    """ base_dir からの相対パス ('img/cloud1.png' など) で画像と音を取り出す """
+
+    def __init__(self, base_dir, headless=False, workers=ASSET_WORKERS):
+        self.base_dir = base_dir
+        self.headless = headless
+        self.executor = ThreadPoolExecutor(max_workers=workers,
+                                           thread_name_prefix='assets')
+        self.music_executor = ThreadPoolExecutor(max_workers=1,
+                                                 thread_name_prefix='music')
+        self.pending = {}  # 名前 -> デコード中の Future
+        self.pending_sounds = {}
+        self.pending_music = []  # 音楽用のスレッドの Future
+        self.images = {}
+        self.sounds = {}
+        self.started = perf_counter()
+        self.ready_ms = None  # 全ての画像が使えるようになるまでの時間
+
+    def path(self, name):
+        return path.join(self.base_dir, name)
+
+    def preload(self, *names):
+        """ 画像のデコードを別のスレッドで始める (待たない) """
+        for name in names:
+            if name not in self.images and name not in self.pending:
+                self.pending[name] = self.executor.submit(
+                    pg.image.load, self.path(name))
+
+    def image(self, name):
+        """ 画像を取り出す (デコード中なら終わるまで待つ)
+
+        画面のピクセル形式への変換はメインスレッドでここで行う
+        """
+        image = self.images.get(name)
+        if image is None:
+            future = self.pending.pop(name, None)
+            if future is None:
+                image = pg.image.load(self.path(name))
+            else:
+                image = future.result()
+            image = self.images[name] = convert_image(image)
+        return image
+
+    def wait(self):
+        """ preload した全ての画像が使えるようになるまで待つ """
+        for name in list(self.pending):
+            self.image(name)
+        if self.ready_ms is None:
+            self.ready_ms = (perf_counter() - self.started) * 1000
+        return self.ready_ms
+
+    def preload_sounds(self, *names, music=False):
+        """ 音のデコードを別のスレッドで始める (音楽も全てデコードする)
+
+        music なら 音楽用のスレッドで1つずつデコードする
+        """
+        if self.headless:
+            return
+        executor = self.music_executor if music else self.executor
+        for name in names:
+            if name not in self.sounds and name not in self.pending_sounds:
+                future = self.pending_sounds[name] = executor.submit(
+                    pg.mixer.Sound, self.path(name))
+                if music:
+                    self.pending_music.append(future)
+
+    def music_decoding(self):
+        """ 音楽用のスレッドでデコード中の音楽があるか """
+        self.pending_music = [future for future in self.pending_music
+                              if not future.done()]
+        return bool(self.pending_music)
+
+    def sound_ready(self, name):
+        """ 音 name を待たずに取り出せるか (デコードが終わったか preload していない) """
+        future = self.pending_sounds.get(name)
+        return future is None or future.done()
+
+    def sound(self, name, volume=None):
+        """ 音 (初めて使うときに一度だけ読み込む、デコード中なら終わるまで待つ) """
+        sound = self.sounds.get(name)
+        if sound is None:
+            future = self.pending_sounds.pop(name, None)
+            if self.headless:
+                sound = NullSound()
+            elif future is None:
+                sound = pg.mixer.Sound(self.path(name))
+            else:
+                sound = future.result()
+            if volume is not None:
+                sound.set_volume(volume)
+            self.sounds[name] = sound
+        return sound
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+        self.music_executor.shutdown(wait=False)
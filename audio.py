@@ -0,0 +1,161 @@
+# 効果音と音楽
+#
+# 効果音は種類 (SOUND_CHANNELS) ごとに決まったチャンネルだけで鳴らす。
+# 同じ種類のチャンネルが全て使われていたら その種類の一番古い音を止めるので、
+# ジャンプを連打しても ほかの種類の音は止まらない。
+# 同じ音を SOUND_CHANNELS の時間より短い間隔で鳴らそうとしたら鳴らさない。
+#
+# snd/ の音は全て (音楽もデコードして) 別のスレッドで先に読み込んでおく
+# (効果音は assets のスレッドで、時間のかかる音楽は音楽用のスレッドで順に)。
+# 効果音はそれぞれ自分のデコードが終わったら鳴らす (まだなら鳴らさない)。
+# 音楽のデコード中にチャンネルを使うと SDL_mixer のロックで終わるまで
+# 待たされるので、音楽は音楽のデコードが全て終わってから update() で始める。
+# 音楽は2つのチャンネルで交互に鳴らし、曲を変えるときはクロスフェードする。
+import os
+from time import perf_counter
+
+import pygame as pg
+
+from settings import *
+
+SOUND_TYPES = ('.wav', '.ogg')
+MUSIC_CHANNELS = 2
+
+
+class ChannelPool:
+    """ 1つの種類の効果音のチャンネル
+
+    空いているチャンネルで鳴らし、全て使っていたら一番前に鳴らしたものを止める。
+    同じ音を window (millisecond) より短い間隔で鳴らそうとしたら鳴らさない
+    """
+
+    def __init__(self, channels, window):
+        self.channels = channels
+        self.window = window
+        self.started = [0.0] * len(channels)  # チャンネルごとの鳴らし始めた時間
+        self.last = {}  # 音の名前 -> 最後に鳴らした時間
+
+    def play(self, name, sound, now):
+        last = self.last.get(name)
+        if last is not None and now - last < self.window:
+            return None
+        self.last[name] = now
+        started = self.started
+        for i, channel in enumerate(self.channels):
+            if not channel.get_busy():
+                break
+        else:
+            i = started.index(min(started))
+        started[i] = now
+        channel = self.channels[i]
+        channel.play(sound)
+        return channel
+
+
+class AudioManager:
+    """ 名前 (settings.SOUNDS) で効果音を、ファイル名で音楽を鳴らす
+
+    音は assets (AssetManager) のスレッドでデコードする
+    """
+
+    def __init__(self, assets, sounds=SOUNDS, channels=SOUND_CHANNELS):
+        self.assets = assets
+        self.sounds = sounds
+        self.volumes = {}  # ファイル名 -> 音量 (set_volume したもの)
+        # 0, 1 は音楽、そのあとに種類ごとのチャンネル
+        reserved = MUSIC_CHANNELS + sum(n for n, window in channels.values())
+        pg.mixer.set_num_channels(reserved + SOUND_FREE_CHANNELS)
+        pg.mixer.set_reserved(reserved)
+        self.music_channels = [pg.mixer.Channel(i)
+                               for i in range(MUSIC_CHANNELS)]
+        self.pools = {}
+        index = MUSIC_CHANNELS
+        for kind, (count, window) in channels.items():
+            self.pools[kind] = ChannelPool(
+                [pg.mixer.Channel(i) for i in range(index, index + count)],
+                window)
+            index += count
+        self.music = None  # 今の音楽のチャンネルの番号
+        self.music_volume = 1.0
+        self.wanted = None  # 読み込み中の音楽 (名前, loops, 音量)
+
+    def preload(self, directory='snd'):
+        """ directory の全ての音のデコードを始める (待たない)
+
+        効果音 (self.sounds のファイル) 以外は音楽として 音楽用のスレッドで
+        """
+        effects = {filename for filename, kind, volume in self.sounds.values()}
+        for name in sorted(os.listdir(self.assets.path(directory))):
+            if name.endswith(SOUND_TYPES):
+                self.assets.preload_sounds(directory + '/' + name,
+                                           music=name not in effects)
+
+    def ready(self, name):
+        """ 音 name (ファイル名) のデコードが終わっていて いま鳴らせるか """
+        return self.assets.sound_ready(name)
+
+    def music_ready(self, name):
+        """ 音楽 name をいま始めても待たされないか (音楽のデコード中でない) """
+        return self.ready(name) and not self.assets.music_decoding()
+
+    def play(self, name):
+        """ 効果音 name を鳴らす (鳴らしたチャンネルか None を返す) """
+        filename, kind, volume = self.sounds[name]
+        if not self.ready('snd/' + filename):
+            return None
+        sound = self.assets.sound('snd/' + filename)
+        if self.volumes.get(filename) != volume:
+            sound.set_volume(volume)
+            self.volumes[filename] = volume
+        return self.pools[kind].play(name, sound, perf_counter() * 1000)
+
+    def play_music(self, name, loops=-1, volume=None, fade=MUSIC_FADE):
+        """ 音楽を最初から鳴らす (前の音楽とは fade の時間でクロスフェード)
+
+        volume を省略すると 前の音楽と同じ音量
+        """
+        if volume is not None:
+            self.music_volume = volume
+        if not self.music_ready(name):
+            # デコードが終わったら update() で始める
+            self.stop_music(fade)
+            self.wanted = (name, loops, self.music_volume)
+            return
+        sound = self.assets.sound(name)
+        self.stop_music(fade)
+        # 止めているチャンネルではない方で鳴らす
+        self.music = 0 if self.music is None else 1 - self.music
+        channel = self.music_channels[self.music]
+        channel.set_volume(self.music_volume)
+        channel.play(sound, loops=loops, fade_ms=fade)
+
+    def stop_music(self, fade=MUSIC_FADE):
+        """ 今の音楽を fade の時間で小さくして止める """
+        self.wanted = None
+        if self.music is not None:
+            self.music_channels[self.music].fadeout(fade)
+
+    def update(self):
+        """ 読み込み中だった音楽の準備ができていれば始める (フレームごとに呼ぶ) """
+        if self.wanted and self.music_ready(self.wanted[0]):
+            name, loops, volume = self.wanted
+            self.play_music(name, loops, volume)
+
+
+class NullAudio:
+    """ headless (または音が使えない) ときの AudioManager (何もしない) """
+
+    def preload(self, directory='snd'):
+        pass
+
+    def play(self, name):
+        return None
+
+    def play_music(self, name, loops=-1, volume=None, fade=MUSIC_FADE):
+        pass
+
+    def stop_music(self, fade=MUSIC_FADE):
+        pass
+
+    def update(self):
+        pass
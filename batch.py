@@ -0,0 +1,555 @@
+# N個のゲームを NumPy の配列でまとめて進めるシミュレーター
+#
+# Game.step と同じルール (Player.update の物理、着地、スクロール、BOOST、
+# mob の動き、platform の補充) を (N, ...) の配列に対して一度に計算する。
+# 画像や spritecollide は使わないので、衝突判定はマスクではなく rect で行う。
+# player の rect は Player と同じく アニメーションのフレームで高さが変わる。
+# platform の補充は LEVEL_GENERATOR と同じ (True ならゲームごとの LevelGenerator
+# の chunk と mob、False なら画面に6個になるようにランダムに足す)。
+#
+#   python batch.py [steps] [runs]    Game と1ステップずつ同じになるか確かめる
+#                                     (LEVEL_GENERATOR が False / True の両方)
+import sys
+from collections import deque
+from os import path
+
+import numpy as np
+
+from settings import *
+from config import DEFAULT_CONFIG
+from level import LevelGenerator, PlatformSpec, PLATFORM_FRAMES
+from sprites import read_atlas
+from replay import LEFT, RIGHT, JUMP, JUMP_CUT
+
+# 画像の大きさ (spritesheet の半分の大きさで使っている)
+_frames = read_atlas(path.join(path.dirname(__file__), 'img',
+                               path.splitext(SPRITESHEET)[0] + '.xml'))
+
+
+def frame_size(name):
+    """ atlasの画像の ゲーム内での大きさ (width, height) """
+    x, y, width, height = _frames[name]
+    return width // 2, height // 2
+
+
+# Player のアニメーションのフレーム (Player.load_images と同じ順番)
+# 幅は全て同じで 高さだけ変わる (左右反転しても同じ大きさ)
+PLAYER_W = frame_size('bunny1_ready.png')[0]
+IDLE_H = np.array([frame_size('bunny1_ready.png')[1],
+                   frame_size('bunny1_stand.png')[1]])
+WALK_H = np.array([frame_size('bunny1_walk1.png')[1],
+                   frame_size('bunny1_walk2.png')[1]])
+# Player.anim_state (None はジャンプ中でフレームを変えない)
+ANIM_NONE, ANIM_IDLE, ANIM_WALK = range(3)
+# Platform の画像は2種類 (level.PLATFORM_FRAMES の順番)
+PLATFORM_SIZES = np.array([frame_size(name) for name in PLATFORM_FRAMES],
+                          dtype=float)
+POW_W, POW_H = frame_size('powerup_jetpack.png')
+# Mob の画像 (MobState.images と同じ順番 0: 上へ 1: 下へ) の (width, height)
+MOB_SIZES = np.array([frame_size('flyMan_fly.png'),
+                      frame_size('flyMan_jump.png')])
+MOB_HALF = MOB_SIZES[:, 1] // 2
+
+# 1ゲームあたりの platform の枠
+# LevelGenerator は画面と LEVEL_MARGIN の上に 1つ先の chunk まで置く
+MAX_PLATFORMS = ((HEIGHT + LEVEL_MARGIN + CHUNK_HEIGHT) // LEVEL_GAP_EASY[0] +
+                 len(PLATFORM_LIST) if LEVEL_GENERATOR else 8)
+MAX_MOBS = 16  # 1ゲームあたりの mob の枠
+MOB_JITTER = np.array([-1000, -500, 0, 500, 1000])
+
+
+def round_half_away(values):
+    """ float を pg.Rect に入れたときと同じように丸める (0.5 は 0 から遠い方へ) """
+    return np.trunc(values + np.copysign(0.5, values))
+
+
+def overlap(ax, ay, aw, ah, bx, by, bw, bh):
+    """ rect同士が重なっているか (pg.Rect.colliderect と同じ条件) """
+    return (ax < bx + bw) & (ax + aw > bx) & (ay < by + bh) & (ay + ah > by)
+
+
+class BatchGame:
+    """ N個の独立したゲームの状態
+
+    入力は replay.py と同じ bit (LEFT, RIGHT, JUMP, JUMP_CUT) の int 配列
+    config (config.Config) は全てのゲームで同じものを使う
+    位置は画面の座標 (スクロールすると全てが下へ動く)、camera はそのときの
+    Game.camera.y (LevelGenerator の world座標と変換する)
+    """
+
+    def __init__(self, n, seed=None, config=None, level=LEVEL_GENERATOR,
+                 max_platforms=MAX_PLATFORMS):
+        self.n = n
+        self.config = config or DEFAULT_CONFIG
+        self.rng = np.random.default_rng(seed)
+        self.level = level
+        # player (pos は Player.pos と同じく足元の中央)
+        self.pos = np.zeros((n, 2))
+        self.vel = np.zeros((n, 2))
+        self.acc = np.zeros((n, 2))
+        self.rect_x = np.zeros(n)  # Player.rect.centerx
+        self.rect_bottom = np.zeros(n)  # Player.rect.bottom
+        self.jumping = np.zeros(n, dtype=bool)
+        # アニメーション (Player.animate / next_frame)
+        self.anim = np.zeros(n, dtype=np.int8)  # ANIM_NONE, ANIM_IDLE, ANIM_WALK
+        self.frame = np.zeros(n, dtype=np.int8)  # Player.current_frame
+        self.frame_h = np.zeros(n)  # 今のフレームの画像の高さ
+        self.last_update = np.zeros(n)
+        self.next_frame = np.zeros(n)  # 次のフレームに進む時間 (なければ inf)
+        # platform (x, y は左上)
+        self.plat_x = np.zeros((n, max_platforms))
+        self.plat_y = np.zeros((n, max_platforms))
+        self.plat_w = np.zeros((n, max_platforms))
+        self.plat_h = np.zeros((n, max_platforms))
+        self.plat_kind = np.zeros((n, max_platforms), dtype=np.int8)
+        self.plat_alive = np.zeros((n, max_platforms), dtype=bool)
+        self.pow_alive = np.zeros((n, max_platforms), dtype=bool)
+        # mob (MobState と同じく rect の左上と 画像の番号)
+        self.mob_x = np.zeros((n, MAX_MOBS))
+        self.mob_y = np.zeros((n, MAX_MOBS))
+        self.mob_vx = np.zeros((n, MAX_MOBS))
+        self.mob_vy = np.zeros((n, MAX_MOBS))
+        self.mob_dy = np.zeros((n, MAX_MOBS))
+        self.mob_frame = np.zeros((n, MAX_MOBS), dtype=np.int8)
+        self.mob_alive = np.zeros((n, MAX_MOBS), dtype=bool)
+        self.next_mob = np.zeros(n)  # 次の mob が出てくる時間
+        # level (ゲームごとの LevelGenerator と これから mob が出てくる位置)
+        self.camera = np.zeros(n)
+        self.levels = [None] * n
+        self.mob_slots = [deque() for i in range(n)]
+        self.chunk_bottom = np.full(n, -np.inf)  # 次の chunk の bottom
+        self.slot_y = np.full(n, -np.inf)  # 次の mob の位置 (なければ -inf)
+        # ゲームの状態
+        self.now = np.zeros(n)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.steps = np.zeros(n, dtype=np.int64)
+        self.playing = np.zeros(n, dtype=bool)
+        self.cause = np.zeros(n, dtype=np.int8)  # telemetry.CAUSES の番号 (-1 は生きている)
+        self.reset()
+
+    def reset(self, mask=None):
+        """ mask で選んだゲーム (None なら全部) を最初の状態に戻す """
+        if mask is None:
+            mask = np.ones(self.n, dtype=bool)
+        idx = np.flatnonzero(mask)
+        self.pos[idx] = (40, HEIGHT - 100)
+        self.vel[idx] = 0
+        self.acc[idx] = 0
+        # 最初は rect.center が (40, HEIGHT - 100)
+        height = IDLE_H[0]
+        self.rect_x[idx] = 40
+        self.rect_bottom[idx] = HEIGHT - 100 - height // 2 + height
+        self.jumping[idx] = False
+        self.anim[idx] = ANIM_NONE
+        self.frame[idx] = 0
+        self.frame_h[idx] = height
+        self.last_update[idx] = 0
+        self.next_frame[idx] = np.inf
+        self.plat_alive[idx] = False
+        self.pow_alive[idx] = False
+        self.mob_alive[idx] = False
+        self.next_mob[idx] = self.config.mob_freq + self.rng.choice(
+            MOB_JITTER, size=len(idx))
+        self.camera[idx] = 0
+        self.now[idx] = 0
+        self.score[idx] = 0
+        self.steps[idx] = 0
+        self.playing[idx] = True
+        self.cause[idx] = -1
+        # 最初の platform
+        start = np.array(PLATFORM_LIST, dtype=float)
+        k = len(start)
+        self.plat_x[np.ix_(idx, range(k))] = start[:, 0]
+        self.plat_y[np.ix_(idx, range(k))] = start[:, 1]
+        select = np.zeros(self.plat_alive.shape, dtype=bool)
+        select[np.ix_(idx, range(k))] = True
+        self.spawn_platforms(select)
+        # 最初の platform より上は LevelGenerator が作る (Game.reset と同じ)
+        seeds = self.rng.integers(2 ** 63, size=len(idx), dtype=np.uint64)
+        for i, seed in zip(idx, seeds):
+            self.mob_slots[i].clear()
+            self.slot_y[i] = -np.inf
+            if not self.level:
+                continue
+            top = k - 1
+            start = PlatformSpec(int(self.plat_x[i, top]),
+                                 int(self.plat_y[i, top]),
+                                 PLATFORM_FRAMES[self.plat_kind[i, top]], False)
+            self.levels[i] = LevelGenerator(int(seed), start,
+                                            config=self.config)
+            self.chunk_bottom[i] = self.levels[i].peek().bottom
+
+    def spawn_platforms(self, select):
+        """ select の枠に platform を作る (x, y は先に入れておく) """
+        kind = self.rng.integers(0, 2, size=select.shape)
+        self.plat_kind[select] = kind[select]
+        self.plat_w[select] = PLATFORM_SIZES[kind[select], 0]
+        self.plat_h[select] = PLATFORM_SIZES[kind[select], 1]
+        self.plat_alive |= select
+        self.pow_alive |= select & (
+            self.rng.integers(0, 100, size=select.shape) <
+            self.config.pow_spawn_pct)
+
+    def player_rect(self):
+        """ player の rect (left, top, width, height) """
+        return (self.rect_x - PLAYER_W // 2, self.rect_bottom - self.frame_h,
+                PLAYER_W, self.frame_h)
+
+    def step(self, actions):
+        """ 全てのゲームを1ステップ進める (終わっているゲームはそのまま)
+
+        actions: 長さ N の int 配列 (LEFT | RIGHT | JUMP | JUMP_CUT)
+        """
+        actions = np.asarray(actions)
+        config = self.config
+        live = self.playing.copy()
+        pos, vel, acc = self.pos, self.vel, self.acc
+
+        # jump (Player.jump): 足元 2px 下に platform があればジャンプ
+        px, py, pw, ph = self.player_rect()
+        below = overlap(px[:, None], py[:, None] + 2, pw, ph[:, None],
+                        self.plat_x, self.plat_y, self.plat_w, self.plat_h)
+        on_ground = (below & self.plat_alive).any(axis=1)
+        jump = live & (actions & JUMP > 0) & on_ground & ~self.jumping
+        self.jumping |= jump
+        vel[jump, 1] = -config.player_jump
+        # jump_cut
+        cut = live & (actions & JUMP_CUT > 0) & self.jumping & (vel[:, 1] < -3)
+        vel[cut, 1] = -3
+
+        self.now[live] += FIXED_DT
+        self.steps[live] += 1
+
+        # Player.animate: 状態が変わったら 最後にフレームを変えてから1コマあと
+        walking = vel[:, 0] != 0
+        state = np.where(walking, ANIM_WALK,
+                         np.where(self.jumping, ANIM_NONE, ANIM_IDLE))
+        changed = live & (state != self.anim)
+        self.anim[changed] = state[changed]
+        self.next_frame[changed] = np.where(
+            state == ANIM_NONE, np.inf,
+            self.last_update + self.frame_time())[changed]
+
+        # Player.update
+        acc_x = np.zeros(self.n)
+        acc_x[actions & LEFT > 0] = -config.player_acc
+        acc_x[actions & RIGHT > 0] = config.player_acc
+        acc_x += vel[:, 0] * config.player_friction
+        acc[live, 0] = acc_x[live]
+        acc[live, 1] = config.player_grav
+        vel[live] += acc[live]
+        vel[live & (np.abs(vel[:, 0]) < 0.1), 0] = 0
+        pos[live] += vel[live] + 0.5 * acc[live]
+        pos[live & (pos[:, 0] > WIDTH + PLAYER_W / 2), 0] = -PLAYER_W / 2
+        pos[live & (pos[:, 0] < -PLAYER_W / 2), 0] = WIDTH + PLAYER_W / 2
+        # rect は world座標 (画面の位置 + camera) で丸める
+        self.rect_x[live] = round_half_away(pos[live, 0])
+        self.rect_bottom[live] = (round_half_away(pos[:, 1] + self.camera) -
+                                  self.camera)[live]
+
+        # MobState.update (画像が変わるときは中心を保つ、y は world座標で丸める)
+        mob = self.mob_alive & live[:, None]
+        self.mob_x[mob] += self.mob_vx[mob]
+        self.mob_vy[mob] += self.mob_dy[mob]
+        turn = mob & (np.abs(self.mob_vy) > 3)
+        self.mob_dy[turn] *= -1
+        frame = np.where(self.mob_dy < 0, 0, 1)
+        swap = mob & (frame != self.mob_frame)
+        top = self.mob_y + np.where(
+            swap, MOB_HALF[self.mob_frame] - MOB_HALF[frame], 0)
+        self.mob_frame[swap] = frame[swap]
+        camera = self.camera[:, None]
+        self.mob_y[mob] = (round_half_away(top + camera + self.mob_vy) -
+                           camera)[mob]
+        mob_w = MOB_SIZES[self.mob_frame, 0]
+        self.mob_alive &= ~(mob & ((self.mob_x > WIDTH + 100) |
+                                   (self.mob_x + mob_w < -100)))
+
+        # mob を作成
+        # (Game.schedule_mob と同じく 出てきたときに次の時間を決める)
+        spawn = live & (self.now >= self.next_mob)
+        jitter = self.rng.choice(MOB_JITTER, size=self.n)
+        self.next_mob[spawn] = self.now[spawn] + config.mob_freq + jitter[spawn]
+        self.spawn_mobs(spawn)
+
+        # Player.next_frame (scheduler): 足元 (rect.bottom) はそのまま
+        advance = live & (self.next_frame <= self.now)
+        self.last_update[advance] = self.now[advance]
+        self.frame[advance] = (self.frame[advance] + 1) % 2
+        frame = self.frame[advance]
+        self.frame_h[advance] = np.where(self.anim[advance] == ANIM_WALK,
+                                         WALK_H[frame], IDLE_H[frame])
+        self.next_frame[advance] = (self.now + self.frame_time())[advance]
+
+        # hit mobs?
+        px, py, pw, ph = self.player_rect()
+        mob_w = MOB_SIZES[self.mob_frame, 0]
+        mob_h = MOB_SIZES[self.mob_frame, 1]
+        hit = overlap(px[:, None], py[:, None], pw, ph[:, None],
+                      self.mob_x, self.mob_y, mob_w, mob_h)
+        self.game_over(live & (hit & self.mob_alive).any(axis=1), 0)
+
+        # 着地 (落ちているときだけ、一番下の platform に乗る)
+        hits = overlap(px[:, None], py[:, None], pw, ph[:, None], self.plat_x,
+                       self.plat_y, self.plat_w, self.plat_h) & self.plat_alive
+        falling = live & (vel[:, 1] > 0) & hits.any(axis=1)
+        lowest = np.argmax(np.where(hits, self.plat_y + self.plat_h, -np.inf),
+                           axis=1)
+        rows = np.arange(self.n)
+        low_x = self.plat_x[rows, lowest]
+        low_y = self.plat_y[rows, lowest]
+        land = (falling & (low_x + self.plat_w[rows, lowest] + 10 > pos[:, 0]) &
+                (pos[:, 0] > low_x - 10) &
+                (pos[:, 1] < low_y + self.plat_h[rows, lowest] // 2))
+        pos[land, 1] = low_y[land]
+        vel[land, 1] = 0
+        self.jumping[land] = False
+
+        # 画面上部1/4に達したらスクロール (カメラは pixel 単位で動く)
+        scroll = live & (py <= HEIGHT / 4)
+        dy = np.where(scroll, np.round(np.maximum(np.abs(vel[:, 1]), 2)), 0)
+        self.camera -= dy
+        pos[:, 1] += dy
+        self.rect_bottom += dy
+        self.mob_y += dy[:, None]
+        self.plat_y += dy[:, None]
+        gone = self.plat_alive & (self.plat_y >= HEIGHT) & scroll[:, None]
+        self.score += 10 * gone.sum(axis=1)
+        self.plat_alive &= ~gone
+        self.pow_alive &= self.plat_alive
+        px, py, pw, ph = self.player_rect()
+
+        # POWERUP (platform の上に乗っている)
+        pow_x = self.plat_x + self.plat_w // 2 - POW_W // 2
+        pow_y = self.plat_y - 5 - POW_H
+        boost = overlap(px[:, None], py[:, None], pw, ph[:, None],
+                        pow_x, pow_y, POW_W, POW_H) & self.pow_alive
+        boost &= live[:, None]
+        self.pow_alive &= ~boost
+        boosted = boost.any(axis=1)
+        vel[boosted, 1] = -config.boost_power
+        self.jumping[boosted] = False
+
+        # ゲームオーバー: 落ちていくあいだ全てを上へ動かす
+        fall = live & (py + ph > HEIGHT)
+        up = np.where(fall, np.round(np.maximum(vel[:, 1], 10)), 0)
+        self.camera += up
+        self.plat_y -= up[:, None]
+        self.mob_y -= up[:, None]
+        self.rect_bottom -= up
+        self.plat_alive &= ~(fall[:, None] & (self.plat_y + self.plat_h < 0))
+        self.pow_alive &= self.plat_alive
+        mob_h = MOB_SIZES[self.mob_frame, 1]
+        self.mob_alive &= ~(fall[:, None] & (self.mob_y + mob_h < 0))
+        self.game_over(live & ~self.plat_alive.any(axis=1), 1)
+
+        # 新しい platform を作成
+        if self.level:
+            self.stream_level(live)
+            return
+        # 画面には平均的に同じ数のplatform
+        missing = 6 - self.plat_alive.sum(axis=1)
+        free_rank = np.cumsum(~self.plat_alive, axis=1)
+        select = (live[:, None] & ~self.plat_alive &
+                  (free_rank <= missing[:, None]))
+        width = self.rng.integers(50, 100, size=select.shape)
+        self.plat_x[select] = self.rng.integers(0, WIDTH - width)[select]
+        self.plat_y[select] = self.rng.integers(-75, -30,
+                                                size=select.shape)[select]
+        self.spawn_platforms(select)
+
+    def game_over(self, over, cause):
+        """ over のゲームを終える (Game.game_over と同じく 最初の理由だけ残す) """
+        self.cause[over & self.playing] = cause
+        self.playing &= ~over
+
+    def frame_time(self):
+        """ 今のアニメーションの1コマの時間 (Player.frame_time) """
+        return np.where(self.anim == ANIM_WALK, PLAYER_WALK_FRAME,
+                        PLAYER_IDLE_FRAME)
+
+    def stream_level(self, live):
+        """ 画面の上 LEVEL_MARGIN までの chunk を置いて 画面に入った mob を出す
+
+        (Game.stream_level と同じ。chunk が要るゲームだけ1つずつ処理する)
+        """
+        camera = self.camera
+        for i in np.flatnonzero(live & (self.chunk_bottom >
+                                        camera - LEVEL_MARGIN)):
+            level = self.levels[i]
+            while level.peek().bottom > camera[i] - LEVEL_MARGIN:
+                chunk = level.next_chunk()
+                free = np.flatnonzero(~self.plat_alive[i])
+                specs = chunk.platforms[:len(free)]
+                slots = free[:len(specs)]
+                kind = [PLATFORM_FRAMES.index(spec.frame) for spec in specs]
+                self.plat_x[i, slots] = [spec.x for spec in specs]
+                self.plat_y[i, slots] = [spec.y - camera[i] for spec in specs]
+                self.plat_kind[i, slots] = kind
+                self.plat_w[i, slots] = PLATFORM_SIZES[kind, 0]
+                self.plat_h[i, slots] = PLATFORM_SIZES[kind, 1]
+                self.plat_alive[i, slots] = True
+                self.pow_alive[i, slots] = [spec.pow for spec in specs]
+                self.mob_slots[i].extend(chunk.mobs)
+            self.chunk_bottom[i] = level.peek().bottom
+            self.update_slot_y(i)
+        for i in np.flatnonzero(live & (self.slot_y >= camera)):
+            slots = self.mob_slots[i]
+            while slots and slots[0].y >= camera[i]:
+                slot = slots.popleft()
+                free = np.flatnonzero(~self.mob_alive[i])
+                if len(free) == 0:
+                    continue
+                j = free[0]
+                center = -100 if slot.side < 0 else WIDTH + 100
+                self.mob_x[i, j] = center - MOB_SIZES[0, 0] // 2
+                self.mob_vx[i, j] = -slot.side * slot.vx
+                self.mob_y[i, j] = slot.y - camera[i]
+                self.mob_vy[i, j] = 0
+                self.mob_dy[i, j] = 0.5
+                self.mob_frame[i, j] = 0
+                self.mob_alive[i, j] = True
+            self.update_slot_y(i)
+
+    def update_slot_y(self, i):
+        slots = self.mob_slots[i]
+        self.slot_y[i] = slots[0].y if slots else -np.inf
+
+    def spawn_mobs(self, spawn):
+        """ spawn が True のゲームに mob を1つ作る (Mob.reset と同じ) """
+        free = ~self.mob_alive
+        slot = np.argmax(free, axis=1)
+        spawn = spawn & free.any(axis=1)
+        rows = np.flatnonzero(spawn)
+        slot = slot[rows]
+        left = self.rng.random(len(rows)) < 0.5
+        vx = self.rng.integers(1, 4, size=len(rows)).astype(float)
+        self.mob_x[rows, slot] = (np.where(left, -100, WIDTH + 100) -
+                                  MOB_SIZES[0, 0] // 2)
+        self.mob_vx[rows, slot] = np.where(left, vx, -vx)
+        self.mob_y[rows, slot] = self.rng.integers(0, HEIGHT // 2,
+                                                   size=len(rows))
+        self.mob_vy[rows, slot] = 0
+        self.mob_dy[rows, slot] = 0.5
+        self.mob_frame[rows, slot] = 0
+        self.mob_alive[rows, slot] = True
+
+    def run(self, policy, steps):
+        """ policy(batch) が返す actions で最大 steps ステップ進める """
+        for i in range(steps):
+            if not self.playing.any():
+                break
+            self.step(policy(self))
+        return self.score
+
+
+def copy_layout(batch, row, game):
+    """ game (main.Game) の platform と POWERUP を batch の row のゲームに入れる
+
+    mob は入れない (Game はマスクで判定するので rect で判定すると違う)
+    """
+    plats = game.platforms.sprites()
+    if len(plats) > batch.plat_x.shape[1]:
+        raise ValueError('too many platforms: {}'.format(len(plats)))
+    batch.plat_alive[row] = False
+    batch.pow_alive[row] = False
+    batch.mob_alive[row] = False
+    for j, plat in enumerate(plats):
+        batch.plat_x[row, j] = plat.rect.x
+        batch.plat_y[row, j] = plat.rect.y - game.camera.y
+        batch.plat_w[row, j], batch.plat_h[row, j] = plat.rect.size
+        batch.plat_kind[row, j] = PLATFORM_FRAMES.index(plat.frame)
+        batch.plat_alive[row, j] = True
+        batch.pow_alive[row, j] = plat.pow is not None
+
+
+def check(steps=3000, seed=0, level=False):
+    """ Game (headless) と BatchGame を同じ入力で1ステップずつ進めて比べる
+
+    level=False: 配置は毎ステップ Game からコピーし (copy_layout)、Game の mob は消す。
+    level=True: 最初の配置と LevelGenerator (seed と start) だけを Game と同じにして
+    あとは それぞれが chunk と mob を出す (時間で出てくる mob は出さない)。
+    Game の mob はマスクで判定するので rect だけが重なって BatchGame が先に
+    終わったら そこで比べるのをやめる。
+    入力は ClimbBot と ランダムに歩く / 止まる を交互に使う。
+    (比べたステップ数, 違ったときは (名前, Game の値, BatchGame の値)) を返す
+    """
+    import random
+    from bot import ClimbBot
+    from config import make_config
+    from controls import InputState
+    from main import Game
+    from replay import pack_input
+    from telemetry import CAUSES
+    config = make_config(MOB_FREQ=10 ** 9) if level else DEFAULT_CONFIG
+    game = Game(headless=True, seed=seed, config=config)
+    game.reset()
+    batch = BatchGame(1, seed=seed, config=config, level=level,
+                      max_platforms=64)
+    copy_layout(batch, 0, game)
+    if level:
+        # Game と同じ chunk を作る LevelGenerator
+        batch.levels[0] = LevelGenerator(game.level.seed, game.level.start,
+                                         config=config)
+        batch.chunk_bottom[0] = batch.levels[0].peek().bottom
+    bot = ClimbBot()
+    rng = random.Random(seed)
+    walk = InputState()
+    for step in range(steps):
+        if not game.playing:
+            break
+        if step // 240 % 2 == 0:
+            inp = bot(game)
+        else:
+            if step % 30 == 0:
+                walk = InputState(*rng.choice([(1, 0), (0, 1), (0, 0)]),
+                                  False, False)
+            inp = walk._replace(jump=rng.random() < 0.03,
+                                jump_cut=rng.random() < 0.05)
+        if not level:
+            copy_layout(batch, 0, game)
+        game.step(inp)
+        if not level:
+            for mob in game.mobs.sprites():
+                mob.kill()
+        batch.step(np.array([pack_input(inp)]))
+        player = game.player
+        camera = game.camera.y
+        if (level and game.playing and batch.cause[0] == 0 and
+                game.mob_state.near(player.rect)):
+            return step, None
+        px, py, pw, ph = batch.player_rect()
+        cause = game.death_cause
+        for name, expected, actual in [
+                ('pos', (player.pos.x, player.pos.y - camera), batch.pos[0]),
+                ('vel', tuple(player.vel), batch.vel[0]),
+                ('rect', (player.rect.x, player.rect.y - camera,
+                          player.rect.height), (px[0], py[0], ph[0])),
+                ('jumping', player.jumping, batch.jumping[0]),
+                ('camera', camera, batch.camera[0]),
+                ('score', game.score, batch.score[0]),
+                ('playing', game.playing, batch.playing[0]),
+                ('cause', -1 if cause is None else CAUSES.index(cause),
+                 batch.cause[0])]:
+            if not np.allclose(expected, actual, rtol=0, atol=1e-6):
+                return step, (name, expected, actual)
+    return step + 1, None
+
+
+if __name__ == '__main__':
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    failed = 0
+    for level in (False, True):
+        compared = 0
+        for seed in range(runs):
+            count, diff = check(steps, seed, level)
+            compared += count
+            if diff is not None:
+                failed += 1
+                print('level={} seed {}: step {} {} game {} batch {}'.format(
+                    level, seed, count, *diff))
+        print('level={}: {} steps compared in {} runs'.format(level, compared,
+                                                              runs))
+    print('{}/{} runs matched the Game'.format(2 * runs - failed, 2 * runs))
+    sys.exit(1 if failed else 0)
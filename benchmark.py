@@ -0,0 +1,276 @@
+# ゲームループのベンチマーク
+#
+#   python benchmark.py                 全てのシナリオ
+#   python benchmark.py idle swarm      シナリオを選ぶ
+#   python benchmark.py --scale 0.1     ステップ数を 1/10 にする
+#   python benchmark.py --headless      描画しない (update だけ)
+#
+# 最後に sprite の種類ごとの 1つあたりのメモリと update の時間も表示する。
+#
+# SDL の dummy ドライバーを使うので 画面も音もなしで動く。
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from settings import *
+from main import Game
+from sprites import Platform, Pow, Mob, Cloud
+from controls import NO_INPUT
+from bot import ClimbBot
+
+MEMORY_STEPS = 2000  # tracemalloc で測るステップ数 (遅くなるので少しだけ)
+ENTITY_COUNT = 1000  # 1つあたりのメモリを測るときに作る数
+ENTITY_UPDATES = 100  # 1つあたりの update の時間を測るときの回数
+
+
+class Scenario:
+    """ ベンチマークのシナリオ
+
+    setup(game) はゲームが始まるたびに、tick(game) は毎ステップ呼ばれる
+    policy(game) が入力を返す
+    """
+    steps = FPS * 60
+
+    def __init__(self, name):
+        self.name = name
+
+    def setup(self, game):
+        pass
+
+    def tick(self, game):
+        pass
+
+    def policy(self, game):
+        return NO_INPUT
+
+
+class Idle(Scenario):
+    """ 最初の platform の上で何もしない """
+
+
+class Ascent(Scenario):
+    """ BOOST を取り続けて 止まらずに上っていく (スクロールと platform の補充) """
+
+    def setup(self, game):
+        self.bot = ClimbBot()
+
+    def tick(self, game):
+        if game.player.vel.y > 0:
+            game.player.vel.y = -game.config.boost_power
+            game.player.jumping = False
+
+    def policy(self, game):
+        return self.bot(game)
+
+
+class Swarm(Scenario):
+    """ mob を50匹ずつ飛ばし続ける (playerは下で止まっている) """
+    count = 50
+
+    def tick(self, game):
+        for i in range(self.count - len(game.mobs)):
+            Mob.spawn(game)
+
+
+class Clouds(Scenario):
+    """ 画面の中に雲の sprite を500個出しておく (CLOUD_STRIPS = False のとき) """
+    count = 500
+
+    def tick(self, game):
+        rng = game.rng
+        for i in range(self.count - len(game.clouds)):
+            cloud = Cloud.spawn(game)
+            cloud.rect.y = game.cloud_camera.y + rng.randrange(-50, HEIGHT)
+
+
+class CloudLayer(Ascent):
+    """ CLOUD_DENSITY の25倍の雲の背景を 上りながら描く (CloudStrips が帯を作り続ける)
+
+    headless では背景を描かないので ascent と同じ
+    """
+    density = CLOUD_DENSITY * 25
+
+    def setup(self, game):
+        super().setup(game)
+        strips = game.renderer and game.renderer.cloud_strips
+        if strips:
+            strips.density = self.density
+            strips.strips.clear()
+
+
+class Session(Scenario):
+    """ botが30分遊び続ける (ゲームオーバーになったら次のゲーム) """
+    steps = FPS * 60 * 30
+
+    def setup(self, game):
+        self.bot = ClimbBot()
+
+    def policy(self, game):
+        return self.bot(game)
+
+
+SCENARIOS = {
+    'idle': Idle('idle'),
+    'ascent': Ascent('ascent'),
+    'swarm': Swarm('swarm'),
+    # 雲は CLOUD_STRIPS なら背景の帯、そうでなければ sprite
+    'clouds': CloudLayer('clouds') if CLOUD_STRIPS else Clouds('clouds'),
+    'session': Session('session'),
+}
+
+
+def play(game, scenario, steps, draw):
+    """ steps ステップ進める (ゲームオーバーになったら始め直す)
+
+    始め直した回数を返す
+    """
+    restarts = 0
+    for i in range(steps):
+        if not game.playing:
+            game.reset()
+            scenario.setup(game)
+            restarts += 1
+        scenario.tick(game)
+        game.step(scenario.policy(game))
+        if draw:
+            game.draw()
+    return restarts
+
+
+def run(scenario, scale=1.0, headless=False, seed=1):
+    """ シナリオを1つ測って 結果の辞書を返す """
+    steps = max(1, int(scenario.steps * scale))
+    game = Game(headless=headless, seed=seed)
+    game.reset()
+    scenario.setup(game)
+    draw = not headless
+
+    # 速さ
+    gc.collect()
+    collections = sum(s['collections'] for s in gc.get_stats())
+    start = time.perf_counter()
+    restarts = play(game, scenario, steps, draw)
+    elapsed = time.perf_counter() - start
+    collections = sum(s['collections'] for s in gc.get_stats()) - collections
+
+    # メモリ (tracemalloc は遅いので 少しのステップだけ)
+    mem_steps = min(steps, MEMORY_STEPS)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    play(game, scenario, mem_steps, draw)
+    after = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    grown = sum(stat.count_diff for stat in after.compare_to(before, 'filename')
+                if stat.count_diff > 0)
+
+    return {
+        'scenario': scenario.name,
+        'steps': steps,
+        'steps_per_sec': steps / elapsed,
+        'ms_per_step': elapsed * 1000 / steps,
+        'restarts': restarts,
+        'gc_collections': collections,
+        'new_blocks_per_step': grown / mem_steps,
+        'peak_kib': peak / 1024,
+        'sprites': len(game.all_sprites),
+    }
+
+
+def report(results):
+    columns = ['scenario', 'steps', 'steps_per_sec', 'ms_per_step',
+               'restarts', 'gc_collections', 'new_blocks_per_step',
+               'peak_kib', 'sprites']
+    print(' '.join('{:>19}'.format(c) for c in columns))
+    for result in results:
+        print(' '.join('{:>19.3f}'.format(result[c])
+                       if isinstance(result[c], float)
+                       else '{:>19}'.format(result[c]) for c in columns))
+
+
+def measure_entities(count, spawn, update):
+    """ spawn() を count 回呼んだときに増えたメモリと update() 1回の時間
+
+    (1つあたりの byte, 1つあたりの microsecond) を返す
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(count):
+        spawn()
+    grown = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for i in range(ENTITY_UPDATES):
+        update()
+    elapsed = time.perf_counter() - start
+    return grown / count, elapsed * 1e6 / ENTITY_UPDATES / count
+
+
+def entity_costs(seed=1):
+    """ sprite の種類ごとの 1つあたりのメモリと 1フレームの update の時間
+
+    Game.update と同じく Mob は mob_state でまとめて動かし、
+    Platform と Pow には update がない
+    """
+    game = Game(headless=True, seed=seed)
+    game.reset()
+    rng = game.rng
+    plat = next(iter(game.platforms))
+    entities = [
+        ('platform', lambda: Platform.spawn(
+            game, rng.randrange(WIDTH), game.camera.y - rng.randrange(HEIGHT),
+            pow=False), lambda: None),
+        ('pow', lambda: Pow.spawn(game, plat), lambda: None),
+        # 画面の横から入ってくる途中なので 測っているあいだは消えない
+        ('mob', lambda: Mob.spawn(game), game.mob_state.update),
+    ]
+    if not CLOUD_STRIPS:
+        entities.append(('cloud', lambda: Cloud.spawn(game),
+                         game.clouds.update))
+    results = []
+    for name, spawn, update in entities:
+        size, cost = measure_entities(ENTITY_COUNT, spawn, update)
+        results.append({'entity': name, 'count': ENTITY_COUNT,
+                        'bytes': size, 'update_us': cost})
+    return results
+
+
+def report_entities(results):
+    columns = ['entity', 'count', 'bytes', 'update_us']
+    print(' '.join('{:>19}'.format(c) for c in columns))
+    for result in results:
+        print(' '.join('{:>19.3f}'.format(result[c])
+                       if isinstance(result[c], float)
+                       else '{:>19}'.format(result[c]) for c in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Jumpy! benchmark')
+    parser.add_argument('scenarios', nargs='*',
+                        help='実行するシナリオ {} (省略すると全部)'.format(
+                            ', '.join(SCENARIOS)))
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='ステップ数の倍率')
+    parser.add_argument('--headless', action='store_true',
+                        help='描画しない')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    names = args.scenarios or list(SCENARIOS)
+    for name in names:
+        if name not in SCENARIOS:
+            parser.error('unknown scenario: {}'.format(name))
+    report([run(SCENARIOS[name], args.scale, args.headless, args.seed)
+            for name in names])
+    print()
+    report_entities(entity_costs(args.seed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+# 自動でプレイするbot (ベンチマークやパラメータ調整で使う)
+from controls import InputState
+from settings import *
+
+
+class ClimbBot:
+    """ 上にある platform を1つ選んでジャンプし続ける簡単なbot
+
+    Game.simulate や env の policy として使う (bot(game) -> InputState)
+    地面にいるときに目標を決めて、空中ではその上へ動く
+    """
+
+    def __init__(self, jump=PLAYER_JUMP, grav=PLAYER_GRAV):
+        # 1回のジャンプで届く高さ (v^2 / 2g) より少し低いところまで
+        self.reach = jump ** 2 / (2 * grav) * 0.8
+        self.target = None
+
+    def choose(self, game):
+        """ 届く高さにある platform の中で 横に一番近いもの """
+        player = game.player
+        best = None
+        best_dx = None
+        for plat in game.platforms:
+            rise = player.pos.y - plat.rect.top
+            if 20 < rise < self.reach:
+                dx = abs(plat.rect.centerx - player.pos.x)
+                if best is None or dx < best_dx:
+                    best, best_dx = plat, dx
+        return best
+
+    def __call__(self, game):
+        player = game.player
+        on_ground = not player.jumping and player.vel.y == 0
+        if on_ground:
+            self.target = self.choose(game)
+        left = right = False
+        target = self.target
+        if target is not None and target.alive() and not on_ground:
+            # 空中では目標の platform の上へ動く
+            dx = target.rect.centerx - player.pos.x
+            left = dx < -target.rect.width / 4
+            right = dx > target.rect.width / 4
+        return InputState(left, right, on_ground, False)
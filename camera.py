@@ -0,0 +1,26 @@
+# カメラ (画面に映す範囲)
+#
+# sprite の rect は world座標のまま動かさない。スクロールはカメラの y を
+# 変えるだけで、描くときに rect.y - camera.y を画面の位置にする。
+
+
+class Camera:
+    """ 画面の一番上の world座標 y を持つ
+
+    背景(雲)はゆっくりスクロールするので 別の Camera を使う
+    """
+
+    def __init__(self, y=0):
+        self.y = y
+
+    def move(self, dy):
+        """ カメラを dy だけ動かす (上へスクロールするときは dy < 0) """
+        self.y += dy
+
+    def apply(self, rect):
+        """ world座標の rect を画面の位置 (x, y) にする """
+        return rect.x, rect.y - self.y
+
+    def visible(self, rect, height):
+        """ rect が画面 (高さ height) に映っているか """
+        return rect.bottom > self.y and rect.top < self.y + height
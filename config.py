@@ -0,0 +1,25 @@
+# ゲームごとに変えられる設定 (パラメータの調整用)
+#
+# Game(config=...) に渡すと そのゲームだけ settings.py の値の代わりに使う。
+from collections import namedtuple
+
+import settings
+
+# 変えられる settings.py の名前 (Config では小文字にして使う)
+# (ゲームの結果が変わるものだけ。雲は見た目だけなので入れない:
+#  CLOUD_FREQ は前は入っていたが 外した。変えるなら settings.py で)
+TUNABLE = ['PLAYER_ACC', 'PLAYER_FRICTION', 'PLAYER_GRAV', 'PLAYER_JUMP',
+           'BOOST_POWER', 'POW_SPAWN_PCT', 'MOB_FREQ', 'LEVEL_MOBS']
+
+Config = namedtuple('Config', [name.lower() for name in TUNABLE])
+
+DEFAULT_CONFIG = Config(*[getattr(settings, name) for name in TUNABLE])
+
+
+def make_config(base=DEFAULT_CONFIG, **changes):
+    """ base の一部だけを変えた Config (名前は大文字でも小文字でもいい) """
+    changes = {name.lower(): value for name, value in changes.items()}
+    unknown = set(changes) - set(Config._fields)
+    if unknown:
+        raise ValueError('unknown setting: {}'.format(', '.join(sorted(unknown))))
+    return base._replace(**changes)
@@ -0,0 +1,43 @@
+# 入力の状態 (キーボードからでもプログラムからでも同じ形で渡す)
+from collections import namedtuple
+
+import pygame as pg
+
+
+class InputState(namedtuple('InputState', 'left right jump jump_cut')):
+    """ 1ステップ分の入力
+
+    left, right: 押しているあいだ True
+    jump: スペースを押したステップだけ True
+    jump_cut: スペースを離したステップだけ True
+    """
+    __slots__ = ()
+
+    def __new__(cls, left=False, right=False, jump=False, jump_cut=False):
+        return super().__new__(cls, left, right, jump, jump_cut)
+
+
+# 何も押していない入力
+NO_INPUT = InputState()
+
+
+def carry_input(pending, inp):
+    """ まだステップに渡していない jump / jump_cut (pending) を inp に足す
+
+    描画のフレームでステップが進まなかったときに 押したキーをなくさない
+    """
+    return inp._replace(jump=pending.jump or inp.jump,
+                        jump_cut=pending.jump_cut or inp.jump_cut)
+
+
+def read_input(events):
+    """ pygameのイベントとキーの状態から InputState を作る """
+    jump = jump_cut = False
+    for event in events:
+        if event.type == pg.KEYDOWN and event.key == pg.K_SPACE:
+            jump = True
+        # ジャンプを調整 ボタンを押す長さ
+        if event.type == pg.KEYUP and event.key == pg.K_SPACE:
+            jump_cut = True
+    keys = pg.key.get_pressed()
+    return InputState(keys[pg.K_LEFT], keys[pg.K_RIGHT], jump, jump_cut)
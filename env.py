@@ -0,0 +1,178 @@
+# エージェントの学習用の環境 (gym と同じ reset / step の形)
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from settings import *
+from main import Game
+from replay import UNPACKED
+
+# action は replay.py と同じ bit の組み合わせ (0 ~ 15)
+NUM_ACTIONS = 16
+NUM_PLATFORMS = 6  # 観測に入れる platform の数
+NUM_MOBS = 2  # 観測に入れる mob の数
+# player(x, y, vx, vy, jumping) + platform(dx, dy, width, pow) + mob(dx, dy, vx)
+OBS_SIZE = 5 + NUM_PLATFORMS * 4 + NUM_MOBS * 3
+MAX_STEPS = FPS * 60 * 5  # 1回のゲームの最大ステップ数 (5分)
+
+
+def observe(game, out):
+    """ ゲームの状態を out (長さ OBS_SIZE の配列) に書き込む
+
+    位置は画面の大きさで割って -1 ~ 1 くらいの値にする
+    (player は画面上の位置、ほかは player からの距離)
+    """
+    out[:] = 0
+    player = game.player
+    px, py = player.pos.x, player.pos.y
+    # 速さは そのゲームの config のジャンプの速さで割る
+    jump = game.config.player_jump
+    out[0:5] = (px / WIDTH, (py - game.camera.y) / HEIGHT,
+                player.vel.x / jump, player.vel.y / jump, player.jumping)
+    # 近い platform から順に (player からの距離)
+    pows = {pow.plat for pow in game.powerups}
+    plats = sorted(game.platforms, key=lambda p: abs(p.rect.top - py))
+    i = 5
+    for plat in plats[:NUM_PLATFORMS]:
+        out[i:i + 4] = ((plat.rect.centerx - px) / WIDTH,
+                        (plat.rect.top - py) / HEIGHT,
+                        plat.rect.width / WIDTH, plat in pows)
+        i += 4
+    i = 5 + NUM_PLATFORMS * 4
+    mobs = sorted(game.mobs, key=lambda m: abs(m.rect.centery - py))
+    for mob in mobs[:NUM_MOBS]:
+        out[i:i + 3] = ((mob.rect.centerx - px) / WIDTH,
+                        (mob.rect.centery - py) / HEIGHT, mob.vx / 4)
+        i += 3
+    return out
+
+
+class JumpyEnv:
+    """ 1つのゲームを reset / step で動かす環境
+
+    step は (observation, reward, done, info) を返す
+    reward は そのステップで増えた Game.score
+    """
+
+    def __init__(self, seed=None, max_steps=MAX_STEPS, config=None):
+        self.game = Game(headless=True, config=config)
+        self.rng = np.random.default_rng(seed)
+        self.max_steps = max_steps
+        self.steps = 0
+        self.obs = np.zeros(OBS_SIZE, dtype=np.float32)
+
+    def reset(self, out=None):
+        """ 新しいゲームを始めて 最初の観測を返す """
+        self.game.reset(int(self.rng.integers(2 ** 63)))
+        self.steps = 0
+        return observe(self.game, self.obs if out is None else out)
+
+    def step(self, action, out=None):
+        score = self.game.score
+        self.game.step(UNPACKED[int(action)])
+        self.steps += 1
+        done = not self.game.playing or self.steps >= self.max_steps
+        info = {'score': self.game.score, 'steps': self.steps,
+                'seed': self.game.replay.seed}
+        obs = observe(self.game, self.obs if out is None else out)
+        return obs, self.game.score - score, done, info
+
+
+def worker(conn, shm_name, num_envs, start, stop, seed, max_steps, config):
+    """ VecEnv のプロセス: start ~ stop の環境を動かして 共有メモリに書く """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    obs, rewards, dones = buffers(shm, num_envs)
+    seeds = np.random.SeedSequence(seed).spawn(num_envs)[start:stop]
+    envs = [JumpyEnv(s, max_steps, config) for s in seeds]
+    try:
+        while True:
+            cmd, actions = conn.recv()
+            if cmd == 'reset':
+                for i, env in enumerate(envs, start):
+                    env.reset(obs[i])
+                conn.send(None)
+            elif cmd == 'step':
+                infos = []
+                for i, (env, action) in enumerate(zip(envs, actions), start):
+                    o, rewards[i], dones[i], info = env.step(action, obs[i])
+                    if dones[i]:
+                        # 終わったゲームはすぐに次のゲームを始める
+                        env.reset(obs[i])
+                    infos.append(info)
+                conn.send(infos)
+            elif cmd == 'close':
+                break
+    finally:
+        del obs, rewards, dones
+        shm.close()
+        conn.close()
+
+
+def buffers(shm, num_envs):
+    """ 共有メモリを 観測, reward, done の配列として見る """
+    obs = np.ndarray((num_envs, OBS_SIZE), dtype=np.float32, buffer=shm.buf)
+    offset = obs.nbytes
+    rewards = np.ndarray(num_envs, dtype=np.float32, buffer=shm.buf,
+                         offset=offset)
+    dones = np.ndarray(num_envs, dtype=bool, buffer=shm.buf,
+                       offset=offset + rewards.nbytes)
+    return obs, rewards, dones
+
+
+class VecEnv:
+    """ 複数のプロセスで num_envs 個の環境を同時に動かす
+
+    観測, reward, done は共有メモリに直接書かれるので コピーが少ない
+    終わった環境は step の中で自動的に reset される
+    """
+
+    def __init__(self, num_envs, workers=None, seed=None,
+                 max_steps=MAX_STEPS, config=None):
+        self.num_envs = num_envs
+        workers = min(workers or mp.cpu_count(), num_envs)
+        size = num_envs * (OBS_SIZE * 4 + 4 + 1)
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.obs, self.rewards, self.dones = buffers(self.shm, num_envs)
+        self.slices = []
+        self.conns = []
+        self.procs = []
+        for part in np.array_split(np.arange(num_envs), workers):
+            start, stop = int(part[0]), int(part[-1]) + 1
+            conn, child = mp.Pipe()
+            proc = mp.Process(target=worker, daemon=True, args=(
+                child, self.shm.name, num_envs, start, stop, seed, max_steps,
+                config))
+            proc.start()
+            child.close()
+            self.slices.append(slice(start, stop))
+            self.conns.append(conn)
+            self.procs.append(proc)
+
+    def reset(self):
+        for conn in self.conns:
+            conn.send(('reset', None))
+        for conn in self.conns:
+            conn.recv()
+        return self.obs.copy()
+
+    def step(self, actions):
+        """ actions: 長さ num_envs の action
+
+        (observations, rewards, dones, infos) を返す
+        """
+        for conn, part in zip(self.conns, self.slices):
+            conn.send(('step', list(actions[part])))
+        infos = []
+        for conn in self.conns:
+            infos.extend(conn.recv())
+        return self.obs.copy(), self.rewards.copy(), self.dones.copy(), infos
+
+    def close(self):
+        for conn in self.conns:
+            conn.send(('close', None))
+        for proc in self.procs:
+            proc.join()
+        del self.obs, self.rewards, self.dones
+        self.shm.close()
+        self.shm.unlink()
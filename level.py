@@ -0,0 +1,230 @@
+# レベルの生成 (platform, POWERUP, mob の出る位置を先に作っておく)
+#
+# レベルは高さ CHUNK_HEIGHT ごとの chunk に分けて カメラより先に作る。
+# chunk の中の platform は 1つ下の platform からジャンプで届くことを
+# player_jump / player_grav (config.Config) で確かめてから使う。
+# threaded=True なら 別のスレッドで LEVEL_LOOKAHEAD 個先の chunk まで作り続ける。
+#
+#   python level.py [runs]    chunk を作る速さと 難しさの変わり方を表示
+import math
+import queue
+import random
+import sys
+import threading
+import time
+from collections import namedtuple
+from os import path
+
+from settings import *
+from config import DEFAULT_CONFIG
+from sprites import read_atlas
+
+# platform の画像 (Platform.reset と同じ) と ゲーム内での幅
+PLATFORM_FRAMES = ['ground_grass.png', 'ground_grass_small.png']
+_frames = read_atlas(path.join(path.dirname(__file__), 'img',
+                               path.splitext(SPRITESHEET)[0] + '.xml'))
+PLATFORM_WIDTHS = {name: _frames[name][2] // 2 for name in PLATFORM_FRAMES}
+# 着地できる platform の端からの余裕 (Game.update の着地判定と同じ)
+LANDING_MARGIN = 10
+
+# x, y は platform の左上 (world座標)
+PlatformSpec = namedtuple('PlatformSpec', 'x y frame pow')
+# side は -1 (左から) か 1 (右から)
+MobSlot = namedtuple('MobSlot', 'y side vx')
+# bottom から top (bottom - CHUNK_HEIGHT) までの platform と mob
+# platform と mob は下から順番に並んでいる
+Chunk = namedtuple('Chunk', 'index bottom top platforms mobs')
+
+
+def max_rise(jump=PLAYER_JUMP, grav=PLAYER_GRAV):
+    """ 1回のジャンプで上がれる高さ (v^2 / 2g) """
+    return jump ** 2 / (2 * grav)
+
+
+def air_time(rise, jump=PLAYER_JUMP, grav=PLAYER_GRAV):
+    """ ジャンプしてから rise だけ上の高さに落ちてくるまでのステップ数
+
+    届かない高さなら None
+    """
+    d = jump ** 2 - 2 * grav * rise
+    if d < 0:
+        return None
+    return (jump + math.sqrt(d)) / grav
+
+
+def max_vx(acc=PLAYER_ACC, friction=PLAYER_FRICTION):
+    """ 横に歩く速さの最大 (加速と摩擦がつり合う速さ) """
+    return acc / -friction
+
+
+def reachable(a, b, safety=LEVEL_SAFETY, config=DEFAULT_CONFIG):
+    """ platform a の上から platform b に飛び移れるか
+
+    safety は余裕 (届く距離に掛ける)。画面の端はつながっているので
+    横の距離は近い方で測る
+    """
+    rise = a.y - b.y
+    if rise > max_rise(config.player_jump, config.player_grav) * safety:
+        return False
+    t = air_time(rise, config.player_jump, config.player_grav)
+    if t is None:
+        return False
+    wa = PLATFORM_WIDTHS[a.frame]
+    wb = PLATFORM_WIDTHS[b.frame]
+    dx = abs((a.x + wa / 2) - (b.x + wb / 2))
+    dx = min(dx, WIDTH - dx)
+    gap = max(0, dx - (wa + wb) / 2 - LANDING_MARGIN * 2)
+    vx = max_vx(config.player_acc, config.player_friction)
+    return gap <= vx * t * safety
+
+
+def validate(start, platforms, safety=LEVEL_SAFETY, config=DEFAULT_CONFIG):
+    """ start から platforms を下から順番に飛び移っていけるか """
+    prev = start
+    for plat in platforms:
+        if not reachable(prev, plat, safety, config):
+            return False
+        prev = plat
+    return True
+
+
+def lerp(a, b, t):
+    return a + (b - a) * t
+
+
+class LevelGenerator:
+    """ start (一番上の最初の platform) から上へ chunk を作り続ける
+
+    next_chunk() は下から順番に chunk を返す。
+    seed が同じなら threaded でもそうでなくても同じ chunk になる
+    """
+
+    def __init__(self, seed, start, threaded=False, lookahead=LEVEL_LOOKAHEAD,
+                 config=DEFAULT_CONFIG):
+        self.seed = seed
+        self.start = start
+        self.rng = random.Random(seed)
+        self.config = config
+        self.last = start  # 最後に置いた platform
+        self.index = 0
+        self.rejected = 0  # 届かなかったので作り直した chunk の数
+        self.repaired = 0  # 作り直してもだめで 位置を直した platform の数
+        self.ready = None  # peek() で取り出した chunk
+        self.queue = None
+        self.stopped = threading.Event()
+        if threaded:
+            self.queue = queue.Queue(maxsize=lookahead)
+            threading.Thread(target=self.produce, daemon=True,
+                             name='level').start()
+
+    def difficulty(self, index):
+        """ chunk の難しさ 0 (最初) ~ 1 (LEVEL_RAMP 個目から) """
+        return min(1.0, index / LEVEL_RAMP)
+
+    def generate(self):
+        """ 次の chunk を作る (threaded のときは別のスレッドで呼ばれる) """
+        rng = self.rng
+        index = self.index
+        d = self.difficulty(index)
+        bottom = self.last.y
+        top = bottom - CHUNK_HEIGHT
+        gap_min = lerp(LEVEL_GAP_EASY[0], LEVEL_GAP_HARD[0], d)
+        gap_max = lerp(LEVEL_GAP_EASY[1], LEVEL_GAP_HARD[1], d)
+        small = lerp(0.5, 0.9, d)  # 小さい platform の割合
+        pow_pct = self.config.pow_spawn_pct
+        pow_pct = lerp(pow_pct, pow_pct / 2, d)
+        for attempt in range(LEVEL_TRIES):
+            platforms = []
+            y = bottom
+            while True:
+                y -= rng.uniform(gap_min, gap_max)
+                if y < top:
+                    break
+                frame = PLATFORM_FRAMES[rng.random() < small]
+                x = rng.randrange(0, WIDTH - PLATFORM_WIDTHS[frame])
+                platforms.append(PlatformSpec(x, round(y), frame,
+                                              rng.random() * 100 < pow_pct))
+            if validate(self.last, platforms, config=self.config):
+                break
+            self.rejected += 1
+        else:
+            platforms = self.repair(platforms)
+        mobs = []
+        for i in range(int(d * self.config.level_mobs + rng.random())):
+            mobs.append(MobSlot(round(rng.uniform(top, bottom)),
+                                rng.choice([-1, 1]), rng.randrange(1, 4)))
+        mobs.sort(key=lambda slot: -slot.y)
+        if platforms:
+            self.last = platforms[-1]
+        self.index += 1
+        return Chunk(index, bottom, top, platforms, mobs)
+
+    def repair(self, platforms):
+        """ 届かない platform を 1つ下の platform の真上へ動かす """
+        prev = self.last
+        repaired = []
+        for plat in platforms:
+            if not reachable(prev, plat, config=self.config):
+                width = PLATFORM_WIDTHS[plat.frame]
+                x = prev.x + (PLATFORM_WIDTHS[prev.frame] - width) // 2
+                plat = plat._replace(x=min(max(x, 0), WIDTH - width))
+                self.repaired += 1
+            repaired.append(plat)
+            prev = plat
+        return repaired
+
+    def produce(self):
+        """ 別のスレッド: queue がいっぱいになるまで chunk を作っておく """
+        while not self.stopped.is_set():
+            chunk = self.generate()
+            while not self.stopped.is_set():
+                try:
+                    self.queue.put(chunk, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+
+    def peek(self):
+        """ 次の chunk (まだ取り出さない) """
+        if self.ready is None:
+            if self.queue is None:
+                self.ready = self.generate()
+            else:
+                self.ready = self.queue.get()
+        return self.ready
+
+    def next_chunk(self):
+        chunk = self.peek()
+        self.ready = None
+        return chunk
+
+    def close(self):
+        """ 別のスレッドを止める """
+        self.stopped.set()
+
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    start = PlatformSpec(175, 100, PLATFORM_FRAMES[1], False)
+    platforms = [0] * (LEVEL_RAMP + 1)  # chunk の番号ごとの合計
+    mobs = [0] * (LEVEL_RAMP + 1)
+    rejected = repaired = 0
+    began = time.perf_counter()
+    for seed in range(runs):
+        level = LevelGenerator(seed, start)
+        prev = start
+        for i in range(LEVEL_RAMP + 1):
+            chunk = level.next_chunk()
+            assert validate(prev, chunk.platforms)
+            prev = chunk.platforms[-1] if chunk.platforms else prev
+            platforms[i] += len(chunk.platforms)
+            mobs[i] += len(chunk.mobs)
+        rejected += level.rejected
+        repaired += level.repaired
+    elapsed = time.perf_counter() - began
+    count = runs * (LEVEL_RAMP + 1)
+    print('{} chunks ({:.0f} chunks/sec), rejected {}, repaired {}'.format(
+        count, count / elapsed, rejected, repaired))
+    for i in range(0, LEVEL_RAMP + 1, max(1, LEVEL_RAMP // 4)):
+        print('chunk {:3}: {:.2f} platforms, {:.2f} mobs'.format(
+            i, platforms[i] / runs, mobs[i] / runs))
@@ -2,119 +2,359 @@ import pygame as pg
 import random
 from settings import *
 from sprites import *
+from controls import NO_INPUT, carry_input, read_input
+from replay import Replay
+from spatial import BandGroup
+from camera import Camera
+from render import (FullRenderer, DirtyRenderer, TextCache, Projection,
+                    InterpolatedProjection)
+from pacing import FramePacer
+from profiler import FrameProfiler, NullProfiler
+from assets import AssetManager
+from audio import AudioManager, NullAudio
+from level import LevelGenerator, PlatformSpec
+from scores import ScoreStore
+from config import DEFAULT_CONFIG
+from scheduler import Scheduler
+from telemetry import (Telemetry, NullTelemetry, LAND, BOOST, PLATFORM, DEATH,
+                       FRAME, CAUSES)
+from collections import deque
 from os import path
+from time import perf_counter
 
 
 class Game:
-    def __init__(self):
-        """ ゲームを初期化 """
+    def __init__(self, headless=False, seed=None, config=None,
+                 telemetry=False):
+        """ ゲームを初期化
+
+        headless=True のときは画面も音も使わずにシミュレーションだけを行う
+        seed を指定すると 毎回同じゲームになる
+        config (config.Config) を指定すると settings.py の物理や登場の頻度を変えられる
+        telemetry=True のときだけ プレイの記録を書く (人が遊ぶときだけ。
+        ベンチマークや bot のゲームは記録に入れない)
+        """
+        self.started = perf_counter()
+        self.startup_ms = None  # スタート画面が出るまでの時間
         self.running = True
-        pg.init()
-        pg.mixer.init()
-        self.screen = pg.display.set_mode((WIDTH, HEIGHT))
-        pg.display.set_caption(TITLE)
-        self.clock = pg.time.Clock()
+        self.headless = headless
+        self.seed = seed
+        self.config = config or DEFAULT_CONFIG
+        self.rng = random.Random(seed)
+        self.replay = None
+        self.screen = None
+        self.clock = None
+        self.renderer = None
+        self.vsync = False
+        sound = False
+        if not headless:
+            pg.init()
+            try:
+                pg.mixer.init()
+                sound = True
+            except pg.error:
+                print("sound is not available")
+            self.screen = self.open_window()
+            pg.display.set_caption(TITLE)
+            self.clock = pg.time.Clock()
         self.all_sprites = None
         self.platforms = None
+        # 消えたspriteを取っておいて使い回す (class -> spriteのリスト)
+        self.pools = {}
         self.playing = False
         self.player = None
         self.score = 0
+        self.death_cause = None
         self.highscore = 0
-        self.dir = None
+        self.dir = path.dirname(__file__)
+        self.scores = ScoreStore(SCORE_DIR or self.dir)
+        self.assets = AssetManager(self.dir, headless)
+        # 音が使えないときも 鳴らす側は同じように呼べる
+        self.audio = AudioManager(self.assets) if sound else NullAudio()
         self.spritesheet = None
-        self.jump_sound = None
-        self.snd_dir = None
-
-        self.font_name = pg.font.match_font(FONT_NAME)  # FONTを探す
+        self.level = None
+        # ゲーム内の時間 (millisecond)  1ステップごとに FIXED_DT だけ進む
+        self.now = 0
+        self.input = NO_INPUT
+        self.profiler = FrameProfiler() if PROFILE else NullProfiler()
+        # プレイの記録 (別のスレッドが書くので ゲームは待たない)
+        if telemetry and not headless:
+            self.telemetry = Telemetry(
+                TELEMETRY_DIR or path.join(self.dir, 'telemetry'))
+        else:
+            self.telemetry = NullTelemetry()
+
+        if not headless:
+            self.font_name = pg.font.match_font(FONT_NAME)  # FONTを探す
+            self.text_cache = TextCache(self.font_name)
+            # 'fixed' のループではステップの間の位置を補間して描く
+            if LOOP_MODE == 'fixed' and INTERPOLATE:
+                projection = InterpolatedProjection()
+            else:
+                projection = Projection()
+            if DIRTY_RENDER:
+                self.renderer = DirtyRenderer(self, projection)
+            else:
+                self.renderer = FullRenderer(self, projection)
         self.load_data()
 
-    def load_data(self):
-        """ HighScoreデータをロード """
-        self.dir = path.dirname(__file__)
-        img_dir = path.join(self.dir, 'img')
-        with open(path.join(self.dir, HS_FILE), 'r') as f:
+    def open_window(self):
+        """ 画面を作る (VSYNC なら vsync を試して 使えなければ普通の画面) """
+        if VSYNC:
             try:
-                self.highscore = int(f.read())
-            except:
-                self.highscore = 0
+                screen = pg.display.set_mode((WIDTH, HEIGHT), pg.SCALED,
+                                             vsync=1)
+                self.vsync = True
+                return screen
+            except pg.error:
+                print("vsync is not available")
+        return pg.display.set_mode((WIDTH, HEIGHT))
+
+    def load_data(self):
+        """ HighScoreデータをロードして 画像のデコードを始める (待たない) """
+        if not self.headless:
+            self.scores.migrate(path.join(self.dir, HS_FILE))
+        self.highscore = self.scores.best()
+        # 画像と音は別のスレッドでデコードしておく (スタート画面はすぐに出す)
+        self.assets.preload(
+            'img/' + SPRITESHEET,
+            *['img/cloud{}.png'.format(i) for i in range(1, 4)])
+        self.audio.preload('snd')
+
+    def finish_loading(self):
+        """ ゲームで使う画像と音が使えるようになるまで待つ """
+        if self.spritesheet is not None:
+            return
         # spritesheetをロード
-        self.spritesheet = SpriteSheet(path.join(img_dir, SPRITESHEET))
+        self.spritesheet = SpriteSheet(
+            path.join(self.dir, 'img', SPRITESHEET),
+            self.assets.image('img/' + SPRITESHEET))
 
         # load clouds
         self.cloud_images = []
         for i in range(1, 4):
             self.cloud_images.append(
-                pg.image.load(
-                    path.join(img_dir, 'cloud{}.png'.format(i))).convert())
-
-        # load sound
-        self.snd_dir = path.join(self.dir, 'snd')
-        self.jump_sound = pg.mixer.Sound(
-            path.join(self.snd_dir, 'Jump33.wav'))
-        self.jump_sound.set_volume(0.1)
-        self.boost_sound = pg.mixer.Sound(
-            path.join(self.snd_dir, 'Boost16.wav'))
-        self.boost_sound.set_volume(0.1)
+                self.assets.image('img/cloud{}.png'.format(i)))
+        # 雲の画像ごとの mode (大きさを変えた画像にも使う)
+        self.cloud_modes = {image: asset_mode(image)
+                            for image in self.cloud_images}
+        # 大きさを変えた雲の画像 ((画像, scale) -> 画像)
+        self.cloud_cache = {}
+        # 全ての Mob の位置と速さ (Mob の pool と同じく ゲームが変わっても使う)
+        self.mob_state = MobState(self)
+        self.assets.wait()
+
+    def scaled_cloud(self, image, scale):
+        """ 雲の画像を scale 倍にしたもの (同じ大きさは一度だけ作る) """
+        key = (image, scale)
+        scaled = self.cloud_cache.get(key)
+        if scaled is None:
+            rect = image.get_rect()
+            scaled = finalize_image(pg.transform.scale(image, (
+                int(rect.width * scale), int(rect.height * scale))),
+                self.cloud_modes[image])
+            self.cloud_cache[key] = scaled
+        return scaled
 
     def new(self):
         # ゲームオーバー後のニューゲーム
+        self.reset()
+        self.run()
+
+    def reset(self, seed=None):
+        """ 新しいゲームの状態を作る (ゲームループは始めない)
+
+        seed を省略すると Game() に渡した seed、それもなければランダムに決める
+        seed は 0 ~ 2**63-1 にする (replay は uint64、telemetry は int64 で書くので
+        負の数や大きすぎる数だとゲームオーバーのときに保存できない)
+        """
+        self.finish_loading()
+        if seed is None:
+            seed = self.seed
+        if seed is None:
+            seed = random.randrange(2 ** 63)
+        seed &= 2 ** 63 - 1
+        # ゲームごとの乱数 (全ての登場物はこれを使う)
+        self.rng = random.Random(seed)
+        # 入力を記録しておくとあとで同じゲームを再生できる
+        self.replay = Replay(seed)
+        self.telemetry.start_run(seed)
         self.score = 0
+        self.now = 0
+        self.input = NO_INPUT
+        self.death_cause = None  # ゲームオーバーの理由 ('mob' か 'fall')
+        # 前のゲームのspriteは pool に戻す
+        if self.all_sprites:
+            for sprite in self.all_sprites.sprites():
+                sprite.kill()
+        # スクロールはカメラを動かすだけ (雲は背景なのでゆっくり動くカメラ)
+        self.camera = Camera()
+        self.cloud_camera = Camera()
         self.all_sprites = pg.sprite.LayeredUpdates()  # sprite が描かれる順番を指定できるようになる
-        self.platforms = pg.sprite.Group()
-        self.powerups = pg.sprite.Group()
-        self.mobs = pg.sprite.Group()
+        # 衝突判定をするGroupは 近くの候補だけを探せる BandGroup にする
+        self.platforms = BandGroup()
+        self.powerups = BandGroup()
+        self.mobs = pg.sprite.Group()  # 衝突判定の候補は mob_state から探す
         self.clouds = pg.sprite.Group()
+        # 時間になったら呼ぶ予定 (アニメーション, mob の登場)
+        self.scheduler = Scheduler()
 
         self.player = Player(self)
 
         for plat in PLATFORM_LIST:
-            Platform(self, *plat)
-
-        # mob を作成した時間を記録
-        self.mob_timer = 0
-
-        # 音楽を読み込む
-        if self.snd_dir:
-            pg.mixer.music.load(path.join(self.snd_dir, "Happy Tune.ogg"))
-        for i in range(8):
-            c = Cloud(self)
-            c.rect.y += 500
-        self.run()
+            top = Platform.spawn(self, *plat)
+
+        # 最初の platform より上は LevelGenerator が作る
+        if self.level:
+            self.level.close()
+        self.level = None
+        self.mob_slots = deque()  # これから mob が出てくる位置 (上から来る順)
+        if LEVEL_GENERATOR:
+            start = PlatformSpec(top.rect.x, top.rect.y, top.frame, False)
+            # 画面があるときは 別のスレッドで先に作っておく
+            self.level = LevelGenerator(self.rng.randrange(2 ** 63), start,
+                                        threaded=not self.headless,
+                                        config=self.config)
+
+        # 最初の mob の予定
+        self.mob_timer = None
+        self.schedule_mob()
+
+        # 雲は CLOUD_STRIPS なら renderer が背景に描く
+        if not CLOUD_STRIPS:
+            for i in range(8):
+                c = Cloud.spawn(self)
+                c.rect.y += 500
+        if self.renderer:
+            self.renderer.reset()
+        self.playing = True
 
     def run(self):
         # ゲームループ
         # 音楽を再生 (-1 はループ)
-        pg.mixer.music.play(loops=-1)
-        pg.mixer.music.set_volume(0.3)
+        self.audio.play_music('snd/Happy Tune.ogg', loops=-1, volume=0.3)
         self.playing = True
+        if LOOP_MODE == 'fixed':
+            self.run_fixed()
+        else:
+            self.run_lockstep()
+        self.audio.stop_music()
+        self.telemetry.end_run(self.now, self.score)
+        self.scores.record(self.score, self.now, self.replay.seed)
+        self.replay.save(path.join(self.dir, REPLAY_FILE))
+        if PROFILE:
+            self.profiler.dump_csv(path.join(self.dir, PROFILE_CSV))
+            self.profiler.dump_trace(path.join(self.dir, PROFILE_TRACE))
+
+    def run_lockstep(self):
+        """ 1ステップごとに1回描く (clock.tick(FPS)) """
+        prof = self.profiler
         while self.playing:
-            self.clock.tick(FPS)
-            self.events()
-            self.update()
-            self.draw()
-        pg.mixer.music.fadeout(500)
+            prof.begin_frame()
+            # フレームの時間 (前のフレームから millisecond)
+            self.telemetry.emit(FRAME, self.now, self.clock.tick(FPS) * 1000)
+            prof.lap('tick')
+            with prof.section('events'):
+                inp = self.events()
+            with prof.section('update'):
+                self.step(inp)
+            with prof.section('draw'):
+                self.draw()
+            prof.end_frame()
+
+    def run_fixed(self):
+        """ ステップは FIXED_DT ごと、描画は RENDER_FPS (vsync なら画面) ごと
+
+        描画が遅ければ 描画1回で何ステップか進め (最大 MAX_FRAME_SKIP)、
+        速ければ ステップの間の位置を補間して描く
+        """
+        prof = self.profiler
+        projection = self.renderer.projection
+        pacer = FramePacer()  # ゲームごとに作る (前のゲームの遅れは持ち越さない)
+        pending = NO_INPUT  # まだステップに渡していない入力
+        last = perf_counter()
+        while self.playing:
+            prof.begin_frame()
+            # vsync のときは flip が画面の更新を待つ
+            self.clock.tick(0 if self.vsync else RENDER_FPS)
+            now = perf_counter()
+            steps = pacer.advance((now - last) * 1000)
+            self.telemetry.emit(FRAME, self.now, round((now - last) * 1e6))
+            last = now
+            prof.lap('tick')
+            with prof.section('events'):
+                inp = carry_input(pending, self.events())
+            with prof.section('update'):
+                for i in range(steps):
+                    if not self.playing:
+                        break
+                    if i == steps - 1:
+                        projection.snapshot(self)
+                    self.step(inp)
+                    # jump / jump_cut は1ステップだけ
+                    inp = inp._replace(jump=False, jump_cut=False)
+                pending = inp
+            with prof.section('draw'):
+                projection.set_alpha(pacer.alpha)
+                self.draw()
+            prof.end_frame()
+
+    def step(self, inp=NO_INPUT):
+        """ 入力を1つ受け取って 1ステップ(FIXED_DT)だけ進める
+
+        画面や実際の時間には依存しないので headless でも使える
+        """
+        self.input = inp
+        self.replay.record(inp)
+        if inp.jump:
+            self.player.jump()
+        if inp.jump_cut:
+            self.player.jump_cut()
+        self.update()
+
+    def simulate(self, steps, policy=None):
+        """ headlessで最大 steps ステップ進める
+
+        policy(game) は InputState を返す関数 (None なら何も押さない)
+        ゲームオーバーになったら止まり、進めたステップ数を返す
+        """
+        if not self.playing:
+            self.reset()
+        for i in range(steps):
+            if not self.playing:
+                return i
+            self.step(policy(self) if policy else NO_INPUT)
+        return steps
 
     def update(self):
         # アップデート
-        self.all_sprites.update()
-
-        # mob を作成
-        now = pg.time.get_ticks()
-        if now - self.mob_timer > 5000 + random.choice(
-                [-1000, -500, 0, 500, 1000]):
-            self.mob_timer = now
-            Mob(self)
+        prof = self.profiler
+        self.now += FIXED_DT
+        # update があるものだけ (Mob は配列でまとめて動かす)
+        self.player.update()
+        self.mob_state.update()
+        self.clouds.update()
+        prof.lap('update.sprites')
+
+        # 時間になった予定 (アニメーションのフレーム, mob の登場)
+        self.scheduler.run(self.now)
+        prof.lap('update.timers')
 
         # hit mobs?
         # pg.sprite.collide_maskでplayerとmobに設定したself.maskを使用して衝突判定
-        mob_hits = pg.sprite.spritecollide(self.player, self.mobs, False,
+        player_rect = self.player.rect
+        mob_hits = pg.sprite.spritecollide(self.player,
+                                           self.mob_state.near(player_rect),
+                                           False,
                                            pg.sprite.collide_mask)
         if mob_hits:
-            self.playing = False
+            self.game_over('mob')
 
         # check if player hits a platform - only if falling
+        standing = False
         if self.player.vel.y > 0:
-            hits = pg.sprite.spritecollide(self.player, self.platforms, False)
+            hits = pg.sprite.spritecollide(
+                self.player, self.platforms.near(player_rect), False)
             if hits:
                 # 問題： 2つ同時にspritecollideした場合、飛び移れない
                 # 解決: より下にある地面を探す
@@ -130,85 +370,142 @@ class Game:
                         self.player.pos.y = lowest.rect.top
                         self.player.vel.y = 0
                         self.player.jumping = False
+                        standing = True
+                        # 立っているあいだも毎ステップここに来る
+                        if not self.player.standing:
+                            # 高さは最初の地面から (pixel)
+                            self.telemetry.emit(
+                                LAND, self.now,
+                                PLATFORM_LIST[0][1] - lowest.rect.top)
+        self.player.standing = standing
+        prof.lap('update.collide')
 
         # もしplayerが画面上部1/4に達したら
-        if self.player.rect.top <= HEIGHT / 4:
+        camera = self.camera
+        if self.player.rect.top - camera.y <= HEIGHT / 4:
             # 低い確率でCloudを作成
-            if random.randrange(100) < CLOUD_FREQ:
-                Cloud(self)
-
-            self.player.pos.y += max(abs(self.player.vel.y), 2)  # abs = 絶対値を取得
-
-            for cloud in self.clouds:
-                # 雲は背景だからゆっくり降りていく
-                cloud.rect.y += max(abs(self.player.vel.y / 2), 2)
-
-            # mob もplayerの移動とともに下に移動するように
-            for mob in self.mobs:
-                mob.rect.y += max(abs(self.player.vel.y), 2)
-            for plat in self.platforms:
-                plat.rect.y += max(abs(self.player.vel.y), 2)
-                # 画面外に行ったplatformを消す
-                if plat.rect.top >= HEIGHT:
+            if (not CLOUD_STRIPS and
+                    self.rng.randrange(100) < CLOUD_FREQ):
+                Cloud.spawn(self)
+
+            # カメラを上へ動かす (spriteのrectはworld座標のまま)
+            scroll = round(max(abs(self.player.vel.y), 2))  # abs = 絶対値を取得
+            camera.move(-scroll)
+            # 雲は背景だからゆっくり降りていく
+            self.cloud_camera.move(
+                -round(max(abs(self.player.vel.y / 2), 2)))
+
+            # 画面外に行ったplatformを消す
+            bottom = camera.y + HEIGHT
+            for plat in self.platforms.near(
+                    pg.Rect(0, bottom, WIDTH, scroll)):
+                if plat.rect.top >= bottom:
                     plat.kill()
                     self.score += 10
+                    self.telemetry.emit(PLATFORM, self.now, self.score)
+        prof.lap('update.scroll')
 
         # もしPOWERUPにあたったら
-        pow_hits = pg.sprite.spritecollide(self.player, self.powerups, True)
+        pow_hits = pg.sprite.spritecollide(
+            self.player, self.powerups.near(player_rect), False)
         for pow in pow_hits:
+            pow.kill()
             if pow.type == 'boost':
-                self.boost_sound.play()
-                self.player.vel.y = -BOOST_POWER
+                self.telemetry.emit(BOOST, self.now)
+                self.audio.play('boost')
+                self.player.vel.y = -self.config.boost_power
                 self.player.jumping = False
+        prof.lap('update.collide')
 
         # ゲームオーバー
         # 落下を表現
-        if self.player.rect.bottom > HEIGHT:
-            # 全てのsprite
-            for sprite in self.all_sprites:
-                sprite.rect.y -= max(self.player.vel.y, 10)  # max値を取得
-                if sprite.rect.bottom < 0:  # spriteが画面上部に消えたら
+        if self.player.rect.bottom > camera.y + HEIGHT:
+            # 全てのspriteが上へ流れるように カメラを下へ動かす
+            # (playerは画面の下へ落ち続ける)
+            fall = round(max(self.player.vel.y, 10))  # max値を取得
+            camera.move(fall)
+            self.cloud_camera.move(fall)
+            self.player.pos.y += fall
+            for sprite in self.all_sprites.sprites():
+                # spriteが画面上部に消えたら
+                if sprite.rect.bottom < sprite.camera.y:
                     sprite.kill()
         if len(self.platforms) == 0:
-            self.playing = False
+            self.game_over('fall')
+        prof.lap('update.scroll')
+
+        # 新しいplatform を作成
+        if self.level:
+            self.stream_level()
+        else:
+            # 画面には平均的に同じ数のplatform
+            while len(self.platforms) < 6:
+                width = self.rng.randrange(50, 100)
+
+                Platform.spawn(self, self.rng.randrange(0, WIDTH - width),
+                               camera.y + self.rng.randrange(-75, -30))
+        prof.lap('update.spawn')
 
-        # 新しいplatform を作成 / 画面には平均的に同じ数のplatform
-        while len(self.platforms) < 6:
-            width = random.randrange(50, 100)
+    def game_over(self, cause):
+        """ ゲームオーバー (cause は 'mob' か 'fall')
 
-            Platform(self, random.randrange(0, WIDTH - width),
-                     random.randrange(-75, -30))
+        1ステップで mob に当たって 落ちても 最初の理由だけを記録する
+        """
+        if not self.playing:
+            return
+        self.playing = False
+        self.death_cause = cause
+        self.telemetry.emit(DEATH, self.now, CAUSES.index(cause))
+
+    def stream_level(self):
+        """ 画面の上 LEVEL_MARGIN までの chunk を置いて 画面に入った mob を出す """
+        camera = self.camera
+        level = self.level
+        while level.peek().bottom > camera.y - LEVEL_MARGIN:
+            chunk = level.next_chunk()
+            for spec in chunk.platforms:
+                Platform.spawn(self, spec.x, spec.y, spec.frame, spec.pow)
+            self.mob_slots.extend(chunk.mobs)
+        # chunk の mob は mob_freq の予定とは別に出てくる (予定は入れ直さない)
+        while self.mob_slots and self.mob_slots[0].y >= camera.y:
+            Mob.spawn(self, self.mob_slots.popleft())
+
+    def schedule_mob(self):
+        """ 次の mob の予定を入れ直す (mob_freq ± 1000ms) """
+        if self.mob_timer is not None:
+            self.mob_timer.cancel()
+        self.mob_timer = self.scheduler.after(
+            self.config.mob_freq + self.rng.choice([-1000, -500, 0, 500, 1000]),
+            self.spawn_mob)
+
+    def spawn_mob(self):
+        """ 時間になった mob を出して 次の mob の予定を入れる (scheduler から呼ばれる) """
+        Mob.spawn(self)
+        self.schedule_mob()
 
     def events(self):
-        # イベント
-        for event in pg.event.get():
+        """ イベントを処理して このステップの InputState を返す """
+        # 読み込み中だった音楽を始める
+        self.audio.update()
+        events = pg.event.get()
+        for event in events:
             if event.type == pg.QUIT:
                 if self.playing:
                     self.playing = False
                 self.running = False
-            if event.type == pg.KEYDOWN:
-                if event.key == pg.K_SPACE:
-                    self.player.jump()
-            if event.type == pg.KEYUP:
-                # ジャンプを調整 ボタンを押す長さ
-                if event.key == pg.K_SPACE:
-                    self.player.jump_cut()
+            if event.type == pg.KEYDOWN and event.key == pg.K_F3:
+                # フレームの時間の表示を切り替え (PROFILE のときだけ)
+                self.profiler.toggle_overlay()
+        return read_input(events)
 
     def draw(self):
         # 描画
-        self.screen.fill(BGCOLOR)
-        self.all_sprites.draw(self.screen)
-        # LAYERのおかげで画面にblitをしなくて良くなる
-        # self.screen.blit(self.player.image, self.player.rect)
-        self.draw_text(str(self.score), 22, WHITE, WIDTH / 2, 15)
-        pg.display.flip()
+        self.renderer.draw()
 
     def show_start_screen(self):
         # ゲームスタート画面
         # 音楽
-        pg.mixer.music.load(path.join(self.snd_dir, "Yippee.ogg"))
-        pg.mixer.music.play(loops=-1)
-        pg.mixer.music.set_volume(0.05)
+        self.audio.play_music('snd/Yippee.ogg', loops=-1, volume=0.05)
         self.screen.fill(BGCOLOR)
         self.draw_text(TITLE, 48, WHITE, WIDTH / 2, HEIGHT / 4)
         self.draw_text("Arrows to move, Space to jump", 22, WHITE, WIDTH / 2,
@@ -218,15 +515,15 @@ class Game:
         self.draw_text("HIGH SCORE: {}".format(str(self.highscore)), 22, WHITE,
                        WIDTH / 2, 15)
         pg.display.flip()
+        self.report_startup()
         self.wait_for_key()
-        pg.mixer.music.fadeout(500)
+        self.audio.stop_music()
 
     def show_go_screen(self):
         # ゲームオーバー画面
         if not self.running:
             return
-        pg.mixer.music.load(path.join(self.snd_dir, "Yippee.ogg"))
-        pg.mixer.music.play(loops=-1)
+        self.audio.play_music('snd/Yippee.ogg', loops=-1)
         self.screen.fill(BGCOLOR)
         self.draw_text("GAME OVER", 48, WHITE, WIDTH / 2, HEIGHT / 4)
         self.draw_text("Score: {}".format(str(self.score)), 22, WHITE,
@@ -238,9 +535,6 @@ class Game:
             self.highscore = self.score
             self.draw_text("NEW HIGH SCORE!", 22, WHITE, WIDTH / 2,
                            HEIGHT / 2 + 40)
-            with open(path.join(self.dir, HS_FILE), 'w') as f:
-                f.write(str(self.score))
-                print("finished writing")
         else:
             self.draw_text("HIGH SCORE: {}".format(str(self.highscore)), 22,
                            WHITE,
@@ -248,12 +542,23 @@ class Game:
 
         pg.display.flip()
         self.wait_for_key()
-        pg.mixer.music.fadeout(500)
+        self.audio.stop_music()
+
+    def report_startup(self):
+        """ 起動してからスタート画面が出るまでの時間を表示 """
+        if self.startup_ms is not None:
+            return
+        self.startup_ms = (perf_counter() - self.started) * 1000
+        print("startup: {:.0f} ms (budget {} ms)".format(
+            self.startup_ms, STARTUP_BUDGET_MS))
+        if self.startup_ms > STARTUP_BUDGET_MS:
+            print("startup is over budget")
 
     def wait_for_key(self):
         waiting = True
         while waiting:
             self.clock.tick(FPS)
+            self.audio.update()
             for event in pg.event.get():
                 if event.type == pg.QUIT:
                     waiting = False
@@ -261,18 +566,25 @@ class Game:
                 if event.type == pg.KEYUP:
                     waiting = False
 
+    def render_text(self, text, size, color):
+        """ 文字の画像 (キャッシュを共有するので変更しないこと) """
+        return self.text_cache.render(text, size, color)
+
     def draw_text(self, text, size, color, x, y):
-        font = pg.font.Font(self.font_name, size)
-        text_surface = font.render(text, True, color)
+        text_surface = self.render_text(text, size, color)
         text_rect = text_surface.get_rect()
         text_rect.midtop = (x, y)
         self.screen.blit(text_surface, text_rect)
 
 
-g = Game()
-g.show_start_screen()
-while g.running:
-    g.new()
-    g.show_go_screen()
+if __name__ == '__main__':
+    g = Game(telemetry=TELEMETRY)
+    g.show_start_screen()
+    while g.running:
+        g.new()
+        g.show_go_screen()
 
-pg.quit()
+    g.assets.shutdown()
+    g.scores.wait()
+    g.telemetry.close()
+    pg.quit()
@@ -0,0 +1,40 @@
+# 更新と描画の頻度を分ける (fixed update / variable render)
+#
+# ゲームの物理は 1ステップ FIXED_DT で進む (速さと加速は1ステップあたり)。
+# 描画が遅いときに 描画1回につき1ステップしか進めないと ゲームも遅くなり、
+# 120/144Hz の画面では速くなってしまう。
+# FramePacer は実際に経った時間を FIXED_DT ごとのステップに分け、
+# 残りの時間 (alpha) は render.InterpolatedProjection が
+# 前のステップと今のステップの間の位置で描く。
+from settings import *
+
+
+class FramePacer:
+    """ 実際の時間 (millisecond) を FIXED_DT ごとのステップ数にする
+
+    遅れが max_steps ステップを超えたら 超えた分は捨てる
+    (描画を飛ばして追いつこうとし続けないように ゲームを遅くする)
+    """
+
+    def __init__(self, step=FIXED_DT, max_steps=MAX_FRAME_SKIP):
+        self.step = step
+        self.max_steps = max_steps
+        self.lag = 0.0  # まだステップにしていない時間
+        self.dropped = 0  # 捨てたステップの数
+
+    def advance(self, elapsed):
+        """ elapsed だけ時間が経った このフレームで進めるステップ数 """
+        self.lag += elapsed
+        steps = int(self.lag // self.step)
+        if steps > self.max_steps:
+            self.dropped += steps - self.max_steps
+            steps = self.max_steps
+            self.lag %= self.step
+        else:
+            self.lag -= steps * self.step
+        return steps
+
+    @property
+    def alpha(self):
+        """ 次のステップまでの割合 0 ~ 1 (描く位置を補間する) """
+        return self.lag / self.step
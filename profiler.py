@@ -0,0 +1,173 @@
+# フレームの時間を測る (どこで 16.6ms を使っているか)
+import csv
+import json
+from collections import deque
+from time import perf_counter
+
+from settings import *
+
+# 測る処理 (overlay と CSV はこの順番で並べる)
+PHASES = ['frame', 'tick', 'events', 'update', 'update.sprites',
+          'update.timers', 'update.spawn', 'update.collide', 'update.scroll',
+          'draw', 'draw.fill', 'draw.blit', 'draw.flip']
+
+
+def percentile(values, p):
+    """ 並べ替えた values の p パーセンタイル """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+class Section:
+    """ with で囲んだ処理の時間を測る """
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = self.profiler.last = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        profiler = self.profiler
+        profiler.last = perf_counter()
+        profiler.add(self.name, self.start, profiler.last)
+
+
+class FrameProfiler:
+    """ 処理ごとの時間を最近 window フレーム分取っておく
+
+    section(name) は with で囲んだ処理を、lap(name) は前の lap
+    (または section の始まり) からの時間を測る。
+    同じフレームの同じ名前の時間は足し合わせる。
+    """
+
+    def __init__(self, window=PROFILE_WINDOW, trace_limit=PROFILE_TRACE_LIMIT):
+        self.window = window
+        self.history = {name: deque(maxlen=window) for name in PHASES}
+        self.current = {}
+        self.sections = {}
+        # chrome://tracing 用の記録 (名前, 始まり, 長さ) 秒
+        self.trace = deque(maxlen=trace_limit)
+        self.origin = self.last = self.frame_start = perf_counter()
+        self.frames = 0
+        self.stats = {}
+        self.overlay = PROFILE_OVERLAY
+
+    def section(self, name):
+        section = self.sections.get(name)
+        if section is None:
+            section = self.sections[name] = Section(self, name)
+        return section
+
+    def lap(self, name):
+        now = perf_counter()
+        self.add(name, self.last, now)
+        self.last = now
+
+    def add(self, name, start, end):
+        self.current[name] = self.current.get(name, 0.0) + (end - start) * 1000
+        self.trace.append((name, start, end - start))
+
+    def toggle_overlay(self):
+        self.overlay = not self.overlay
+
+    def begin_frame(self):
+        self.frame_start = self.last = perf_counter()
+
+    def end_frame(self):
+        self.add('frame', self.frame_start, perf_counter())
+        history = self.history
+        for name, ms in self.current.items():
+            samples = history.get(name)
+            if samples is None:
+                samples = history[name] = deque(maxlen=self.window)
+            samples.append(ms)
+        self.current.clear()
+        self.frames += 1
+        if self.frames % PROFILE_REFRESH == 0:
+            self.stats = self.summary()
+
+    def summary(self):
+        """ 名前 -> (回数, 平均, p50, p95, p99, 最大) ms """
+        stats = {}
+        for name, samples in self.history.items():
+            if not samples:
+                continue
+            values = sorted(samples)
+            stats[name] = (len(values), sum(values) / len(values),
+                           percentile(values, 50), percentile(values, 95),
+                           percentile(values, 99), values[-1])
+        return stats
+
+    def draw(self, screen, render_text):
+        """ 画面の左上に p50/p95/p99 を表示して 描いた範囲を返す """
+        y = 40
+        rect = None
+        for name in PHASES:
+            stat = self.stats.get(name)
+            if stat is None:
+                continue
+            line = '{:<15}{:6.2f}{:6.2f}{:6.2f}'.format(name, *stat[2:5])
+            image = render_text(line, 14, WHITE)
+            drawn = screen.blit(image, (5, y))
+            rect = drawn if rect is None else rect.union(drawn)
+            y += 15
+        return rect
+
+    def dump_csv(self, filename):
+        with open(filename, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['phase', 'frames', 'mean_ms', 'p50_ms', 'p95_ms',
+                             'p99_ms', 'max_ms'])
+            stats = self.summary()
+            names = ([n for n in PHASES if n in stats] +
+                     sorted(n for n in stats if n not in PHASES))
+            for name in names:
+                count, *times = stats[name]
+                writer.writerow([name, count] +
+                                ['{:.4f}'.format(ms) for ms in times])
+
+    def dump_trace(self, filename):
+        """ chrome://tracing (Perfetto) で開ける JSON """
+        events = [{'name': name, 'ph': 'X', 'pid': 1, 'tid': 1,
+                   'ts': (start - self.origin) * 1e6, 'dur': dur * 1e6}
+                  for name, start, dur in self.trace]
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+class NullSection:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class NullProfiler:
+    """ 測らないときの profiler (何もしない、overlay も出さない) """
+    __slots__ = ()  # overlay をインスタンスに入れられないように
+    overlay = False
+    NULL_SECTION = NullSection()
+
+    def toggle_overlay(self):
+        pass
+
+    def draw(self, screen, render_text):
+        return None
+
+    def section(self, name):
+        return self.NULL_SECTION
+
+    def lap(self, name):
+        pass
+
+    def begin_frame(self):
+        pass
+
+    def end_frame(self):
+        pass
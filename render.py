@@ -0,0 +1,337 @@
+# 画面の描画
+import random
+from collections import OrderedDict
+
+import pygame as pg
+
+from settings import *
+
+
+class TextCache:
+    """ フォントと 描いた文字の画像のキャッシュ
+
+    フォントは大きさごとに1つだけ作る。文字の画像は (text, size, color) ごとに
+    max_size 個まで取っておき、一番長く使われていないものから捨てる (LRU)。
+    返す画像は共有されるので、呼び出し側で変更しないこと
+    """
+
+    def __init__(self, font_name, max_size=TEXT_CACHE_SIZE):
+        self.font_name = font_name
+        self.max_size = max_size
+        self.fonts = {}
+        self.surfaces = OrderedDict()
+
+    def font(self, size):
+        font = self.fonts.get(size)
+        if font is None:
+            font = pg.font.Font(self.font_name, size)
+            self.fonts[size] = font
+        return font
+
+    def render(self, text, size, color):
+        key = (text, size, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+        surface = self.font(size).render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+
+class CloudStrips:
+    """ 雲の層 (背景) を 高さ HEIGHT の帯の画像に描いておく
+
+    背景の world座標 (cloud_camera) を HEIGHT ごとの帯に分け、帯 index の雲は
+    (seed, index) から決める (ゲームの rng は使わない)。画面に映るのは2つの帯なので
+    雲がいくつあっても 描くのは1フレームに2回の blit。
+    帯は映りそうになったときに1つずつ作り、画面から離れたら捨てる
+    """
+
+    def __init__(self, game, density=CLOUD_DENSITY):
+        self.game = game
+        self.density = density
+        self.seed = 0
+        self.strips = {}  # index -> Surface
+
+    def reset(self, seed):
+        self.seed = seed
+        self.strips.clear()
+
+    def clouds(self, index):
+        """ 帯 index に上端がある雲 (画像, x, 帯の上からの y) """
+        game = self.game
+        rng = random.Random(hash((self.seed, index)))
+        for i in range(self.density):
+            image = game.scaled_cloud(rng.choice(game.cloud_images),
+                                      rng.randrange(50, 101) / 100)
+            yield (image, rng.randrange(WIDTH - image.get_width()),
+                   rng.randrange(HEIGHT))
+
+    def render(self, index):
+        """ 帯 index の画像を作る (上の帯の雲は この帯まではみ出す) """
+        strip = pg.Surface((WIDTH, HEIGHT)).convert()
+        strip.fill(BGCOLOR)
+        strip.blits([(image, (x, y - HEIGHT))
+                     for image, x, y in self.clouds(index - 1)], False)
+        strip.blits([(image, (x, y)) for image, x, y in self.clouds(index)],
+                    False)
+        return strip
+
+    def strip(self, index):
+        strip = self.strips.get(index)
+        if strip is None:
+            strip = self.strips[index] = self.render(index)
+        return strip
+
+    def draw(self, screen, camera_y):
+        """ cloud_camera の y から見た背景を描く (画面全体を塗る) """
+        first = int(camera_y // HEIGHT)
+        top = round(first * HEIGHT - camera_y)
+        screen.blit(self.strip(first), (0, top))
+        if top < 0:
+            screen.blit(self.strip(first + 1), (0, top + HEIGHT))
+        # 上へスクロールすると次に映る帯を先に作っておく
+        keep = (first - 1, first, first + 1)
+        for index in [i for i in self.strips if i not in keep]:
+            del self.strips[index]
+        self.strip(first - 1)
+
+
+class Projection:
+    """ sprite を画面のどこに描くか (ゲームの今の位置) """
+
+    def reset(self):
+        pass
+
+    def snapshot(self, game):
+        pass
+
+    def set_alpha(self, alpha):
+        pass
+
+    def camera_y(self, camera):
+        return camera.y
+
+    def positions(self, sprites):
+        """ (sprite, 画面の位置) を返す (画面外の sprite は位置が None) """
+        for sprite in sprites:
+            camera = sprite.camera
+            rect = sprite.rect
+            if camera.visible(rect, HEIGHT):
+                yield sprite, camera.apply(rect)
+            else:
+                yield sprite, None
+
+
+class InterpolatedProjection(Projection):
+    """ 前のステップと今のステップの間 (alpha) の位置で描く
+
+    snapshot() を最後のステップの前に呼んでおく。
+    snap 以上動いた sprite (画面の端を通った player や pool から出し直された
+    sprite) は補間しないで 今の位置に描く
+    """
+
+    def __init__(self, snap=INTERP_SNAP):
+        self.snap = snap
+        self.alpha = 1.0
+        self.prev = {}  # sprite -> 前のステップの rect.topleft
+        self.prev_cameras = {}  # camera -> 前のステップの y
+        self.cameras = {}  # camera -> 描くときの y
+
+    def reset(self):
+        self.prev = {}
+        self.prev_cameras = {}
+        self.cameras = {}
+
+    def snapshot(self, game):
+        self.prev = {sprite: sprite.rect.topleft
+                     for sprite in game.all_sprites}
+        self.prev_cameras = {camera: camera.y
+                             for camera in (game.camera, game.cloud_camera)}
+
+    def set_alpha(self, alpha):
+        self.alpha = alpha
+        self.cameras = {camera: y + (camera.y - y) * alpha
+                        for camera, y in self.prev_cameras.items()}
+
+    def camera_y(self, camera):
+        return self.cameras.get(camera, camera.y)
+
+    def positions(self, sprites):
+        alpha = self.alpha
+        snap = self.snap
+        prev = self.prev
+        cameras = self.cameras
+        for sprite in sprites:
+            rect = sprite.rect
+            x, y = rect.topleft
+            old = prev.get(sprite)
+            if old is not None:
+                dx = x - old[0]
+                dy = y - old[1]
+                if -snap < dx < snap and -snap < dy < snap:
+                    x = old[0] + dx * alpha
+                    y = old[1] + dy * alpha
+            camera = sprite.camera
+            y -= cameras.get(camera, camera.y)
+            if y + rect.height > 0 and y < HEIGHT:
+                yield sprite, (round(x), round(y))
+            else:
+                yield sprite, None
+
+
+class FullRenderer:
+    """ 毎フレーム 画面全体を描き直す
+
+    projection (Projection) が sprite を描く位置を決める
+    """
+
+    def __init__(self, game, projection=None):
+        self.game = game
+        self.projection = projection or Projection()
+        # 雲を sprite で描かないときの背景
+        self.cloud_strips = CloudStrips(game) if CLOUD_STRIPS else None
+        self.score = None
+        self.score_image = None
+        self.score_rect = None
+
+    def reset(self):
+        self.score = None
+        self.projection.reset()
+        if self.cloud_strips and self.game.replay:
+            self.cloud_strips.reset(self.game.replay.seed)
+
+    def update_score(self):
+        """ scoreが変わったときだけ HUDの画像を作り直す (変わったら True) """
+        game = self.game
+        if game.score == self.score:
+            return False
+        self.score = game.score
+        self.score_image = game.render_text(str(game.score), 22, WHITE)
+        self.score_rect = self.score_image.get_rect(midtop=(WIDTH / 2, 15))
+        return True
+
+    def draw_background(self, screen):
+        """ 背景の色と 雲の帯 """
+        if self.cloud_strips:
+            self.cloud_strips.draw(
+                screen, self.projection.camera_y(self.game.cloud_camera))
+        else:
+            screen.fill(BGCOLOR)
+
+    def draw_sprites(self):
+        game = self.game
+        self.draw_background(game.screen)
+        game.profiler.lap('draw.fill')
+        # LAYERの順番に カメラから見た位置へ描く (画面外のspriteは描かない)
+        game.screen.blits(
+            [(sprite.image, pos)
+             for sprite, pos in self.projection.positions(game.all_sprites)
+             if pos is not None], False)
+
+    def draw_overlay(self):
+        """ フレームの時間を表示 (表示した範囲を返す) """
+        profiler = self.game.profiler
+        if profiler.overlay:
+            return profiler.draw(self.game.screen, self.game.render_text)
+        return None
+
+    def draw(self):
+        prof = self.game.profiler
+        self.draw_sprites()
+        self.update_score()
+        self.game.screen.blit(self.score_image, self.score_rect)
+        self.draw_overlay()
+        prof.lap('draw.blit')
+        pg.display.flip()
+        prof.lap('draw.flip')
+
+
+class DirtyRenderer(FullRenderer):
+    """ 変わったところだけを描き直す (pg.sprite.LayeredDirty を使う)
+
+    ゲームの sprite ごとに画面用の DirtySprite (view) を持ち、
+    画像か画面上の位置が変わった view だけを dirty にする。
+    カメラが動いたフレームは全ての sprite が動くので 画面全体を描き直す。
+    """
+
+    def __init__(self, game, projection=None):
+        super().__init__(game, projection)
+        self.screen_rect = game.screen.get_rect()
+        self.background = pg.Surface(self.screen_rect.size).convert()
+        self.background.fill(BGCOLOR)
+        self.group = pg.sprite.LayeredDirty()
+        self.views = {}  # ゲームの sprite -> view
+        self.hud = pg.sprite.DirtySprite()
+        self.cameras = None
+        self.overlay_rect = None
+        self.reset()
+
+    def reset(self):
+        """ 新しいゲーム (スタート画面などの後なので 全体を描き直す) """
+        super().reset()
+        self.group.empty()
+        self.views.clear()
+        self.cameras = None
+        self.overlay_rect = None
+        self.group.add(self.hud, layer=HUD_LAYER)
+
+    def sync(self):
+        """ ゲームの sprite を view に写す (変わったものだけ dirty にする) """
+        game = self.game
+        views = self.views
+        for sprite, pos in self.projection.positions(game.all_sprites):
+            view = views.get(sprite)
+            if view is None:
+                view = pg.sprite.DirtySprite()
+                view.image = None
+                view.rect = pg.Rect(0, 0, 0, 0)
+                views[sprite] = view
+                self.group.add(
+                    view, layer=game.all_sprites.get_layer_of_sprite(sprite))
+            if pos is None:
+                if view.visible:
+                    view.visible = 0
+                    view.dirty = 1  # 前に描いたところを消す
+                continue
+            if (not view.visible or view.image is not sprite.image or
+                    view.rect.topleft != pos):
+                view.image = sprite.image
+                view.rect = pg.Rect(pos, sprite.rect.size)
+                view.visible = 1
+                view.dirty = 1
+        # 消えた sprite の view を消す
+        if len(views) > len(game.all_sprites):
+            for sprite in [s for s in views if not game.all_sprites.has(s)]:
+                views.pop(sprite).kill()
+
+    def draw(self):
+        game = self.game
+        if self.update_score():
+            self.hud.image = self.score_image
+            self.hud.rect = self.score_rect
+            self.hud.dirty = 1
+        self.sync()
+        cameras = (self.projection.camera_y(game.camera),
+                   self.projection.camera_y(game.cloud_camera))
+        if cameras != self.cameras:
+            # スクロール中 (または最初のフレーム) は画面全体を描き直す
+            if self.cloud_strips and (self.cameras is None or
+                                      cameras[1] != self.cameras[1]):
+                self.draw_background(self.background)
+            self.cameras = cameras
+            self.group.repaint_rect(self.screen_rect)
+        elif self.overlay_rect:
+            # 前のフレームの overlay を消す
+            self.group.repaint_rect(self.overlay_rect)
+        game.profiler.lap('draw.fill')
+        rects = self.group.draw(game.screen, self.background)
+        self.overlay_rect = self.draw_overlay()
+        if self.overlay_rect:
+            rects.append(self.overlay_rect)
+        game.profiler.lap('draw.blit')
+        pg.display.update(rects)
+        game.profiler.lap('draw.flip')
@@ -0,0 +1,105 @@
+# 入力の記録と再生 (同じseedと同じ入力なら 同じゲームになる)
+import struct
+import sys
+import time
+
+from controls import InputState
+
+# ファイルの形式
+#   ヘッダ: MAGIC, version(uint8), seed(uint64), ステップ数(uint32)
+#   本体: (入力のbit(uint8), 連続したステップ数(uint16)) の繰り返し
+MAGIC = b'JMPR'
+VERSION = 1
+HEADER = struct.Struct('<4sBQI')
+RUN = struct.Struct('<BH')
+MAX_RUN = 0xFFFF
+
+LEFT, RIGHT, JUMP, JUMP_CUT = 1, 2, 4, 8
+
+
+def pack_input(inp):
+    """ InputState を 1byte にする """
+    return ((LEFT if inp.left else 0) | (RIGHT if inp.right else 0) |
+            (JUMP if inp.jump else 0) | (JUMP_CUT if inp.jump_cut else 0))
+
+
+# 1byte -> InputState の表 (再生のたびに作らない)
+UNPACKED = [InputState(bool(b & LEFT), bool(b & RIGHT), bool(b & JUMP),
+                       bool(b & JUMP_CUT)) for b in range(16)]
+
+
+class Replay:
+    """ 1回分のゲームの seed と ステップごとの入力 """
+
+    def __init__(self, seed, inputs=None):
+        self.seed = seed
+        self.inputs = bytearray() if inputs is None else inputs
+
+    def __len__(self):
+        return len(self.inputs)
+
+    def __iter__(self):
+        for b in self.inputs:
+            yield UNPACKED[b]
+
+    def record(self, inp):
+        """ 1ステップ分の入力を記録 """
+        self.inputs.append(pack_input(inp))
+
+    def save(self, filename):
+        """ 同じ入力が続くところをまとめて保存 """
+        runs = bytearray()
+        inputs = self.inputs
+        i = 0
+        while i < len(inputs):
+            b = inputs[i]
+            j = i + 1
+            while j < len(inputs) and inputs[j] == b and j - i < MAX_RUN:
+                j += 1
+            runs += RUN.pack(b, j - i)
+            i = j
+        with open(filename, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.seed, len(inputs)))
+            f.write(runs)
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, 'rb') as f:
+            data = f.read()
+        magic, version, seed, steps = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('not a replay file: {}'.format(filename))
+        inputs = bytearray()
+        for b, count in RUN.iter_unpack(data[HEADER.size:]):
+            inputs += bytes((b,)) * count
+        if len(inputs) != steps:
+            raise ValueError('broken replay file: {}'.format(filename))
+        return cls(seed, inputs)
+
+
+def play(game, replay):
+    """ 記録した入力でゲームを最初から実行する (画面の速さを待たない)
+
+    最後まで実行したステップ数を返す
+    """
+    game.reset(replay.seed)
+    steps = 0
+    for inp in replay:
+        if not game.playing:
+            break
+        game.step(inp)
+        steps += 1
+    return steps
+
+
+if __name__ == '__main__':
+    from main import Game
+    from settings import REPLAY_FILE
+
+    replay = Replay.load(sys.argv[1] if len(sys.argv) > 1 else REPLAY_FILE)
+    game = Game(headless=True)
+    start = time.perf_counter()
+    steps = play(game, replay)
+    elapsed = time.perf_counter() - start
+    print('seed {}: {} steps, score {} ({:.0f} steps/sec)'.format(
+        replay.seed, steps, game.score, steps / elapsed))
@@ -0,0 +1,62 @@
+# ゲーム内の時間 (Game.now) で動くタイマー
+#
+# 毎フレーム全ての sprite が時間を比べる代わりに、予定を時間の順番に
+# heapq に入れておき、時間になったものだけを呼び出す。
+# Game.now は1ステップごとに FIXED_DT 進むので headless でも replay でも同じ順番になる。
+import heapq
+import itertools
+
+
+class Timer:
+    """ at() / after() が返す予定 (cancel() で取り消せる) """
+    __slots__ = ('when', 'seq', 'callback', 'args')
+
+    def __init__(self, when, seq, callback, args):
+        self.when = when
+        self.seq = seq  # 同じ時間なら入れた順
+        self.callback = callback
+        self.args = args
+
+    def __lt__(self, other):
+        return (self.when, self.seq) < (other.when, other.seq)
+
+    @property
+    def active(self):
+        return self.callback is not None
+
+    def cancel(self):
+        # heapq からは取り出さない (時間になったら捨てる)
+        self.callback = None
+        self.args = ()
+
+
+class Scheduler:
+    """ 時間 (millisecond) になったら callback(*args) を呼ぶ """
+
+    def __init__(self, now=0):
+        self.now = now
+        self.queue = []
+        self.counter = itertools.count()
+
+    def at(self, when, callback, *args):
+        """ when に呼ぶ (過ぎている時間なら次の run() ですぐに呼ぶ) """
+        timer = Timer(when, next(self.counter), callback, args)
+        heapq.heappush(self.queue, timer)
+        return timer
+
+    def after(self, delay, callback, *args):
+        return self.at(self.now + delay, callback, *args)
+
+    def run(self, now):
+        """ now までに時間になった予定を 時間の順番に呼ぶ """
+        self.now = now
+        queue = self.queue
+        while queue and queue[0].when <= now:
+            timer = heapq.heappop(queue)
+            callback, args = timer.callback, timer.args
+            if callback is not None:
+                timer.cancel()
+                callback(*args)
+
+    def __len__(self):
+        return sum(1 for timer in self.queue if timer.active)
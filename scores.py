@@ -0,0 +1,246 @@
+# スコアの記録 (何台ものゲームが同じフォルダに書いても壊れない)
+#
+# scores.log  全てのゲームの記録 (決まった大きさのレコードを後ろに足すだけ)
+# scores.idx  ランキング (上位 SCORE_KEEP 件と log のどこまでを入れたか)
+#
+# 書くときは scores.lock でロックする。idx は一時ファイルに書いてから
+# os.replace で入れ替えるので、途中で落ちても前の idx が残る。
+# log の最後に途中まで書かれたレコードがあれば 読むときは無視して、次に書く前に消す。
+#
+#   python scores.py [n]    上位 n 件を表示
+import heapq
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from os import path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from settings import *
+
+# score, ゲーム内の時間 (millisecond), seed, 終わった時刻 (time.time())
+RECORD = struct.Struct('<IIQd')
+INDEX_MAGIC = b'JMPS'
+INDEX_VERSION = 1
+# magic, version, idx に入れた log の長さ (byte), レコードの数
+INDEX_HEADER = struct.Struct('<4sBQI')
+READ_RECORDS = 1024  # log を一度に読むレコードの数
+
+Run = namedtuple('Run', 'score duration seed time')
+
+
+def score_of(run):
+    return run.score
+
+
+class FileLock:
+    """ with で囲んだあいだ ほかのプロセスが書けないようにする
+
+    ロックは開いたファイルごとなので スレッドごとに別の FileLock を使う
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.filename, 'a+b')
+        if fcntl:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        else:
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        else:
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        self.file.close()
+        self.file = None
+
+
+def atomic_write(filename, data):
+    """ 一時ファイルに書いてから入れ替える (途中で落ちても元のファイルが残る) """
+    fd, tmp = tempfile.mkstemp(dir=path.dirname(filename) or '.',
+                               prefix=path.basename(filename), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, filename)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def read_runs(f, start=0, stop=None):
+    """ log の start から stop (byte) までのレコードを少しずつ読む
+
+    最後の途中までのレコードは無視する
+    """
+    f.seek(start)
+    remaining = None if stop is None else (stop - start) // RECORD.size
+    while remaining is None or remaining > 0:
+        count = READ_RECORDS if remaining is None else min(READ_RECORDS,
+                                                           remaining)
+        data = f.read(count * RECORD.size)
+        usable = len(data) - len(data) % RECORD.size
+        for fields in RECORD.iter_unpack(data[:usable]):
+            yield Run(*fields)
+        if len(data) < count * RECORD.size:
+            return
+        if remaining is not None:
+            remaining -= count
+
+
+class ScoreStore:
+    """ directory の中の scores.log / scores.idx
+
+    record() で1回のゲームを記録し、top(n) で上位 n 件を返す。
+    idx に入っていない log のレコードが compact_every 件を超えたら
+    別のスレッドで idx を作り直す (compact)。
+    """
+
+    def __init__(self, directory, keep=SCORE_KEEP,
+                 compact_every=SCORE_COMPACT_EVERY):
+        self.log = path.join(directory, SCORE_LOG)
+        self.index = path.join(directory, SCORE_INDEX)
+        self.lock_file = path.join(directory, SCORE_LOCK)
+        self.keep = keep
+        self.compact_every = compact_every
+        self.compactor = None
+
+    def lock(self):
+        return FileLock(self.lock_file)
+
+    def read_index(self):
+        """ (idx に入れた log の長さ, 上位のレコード) """
+        try:
+            with open(self.index, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return 0, []
+        magic, version, covered, count = INDEX_HEADER.unpack_from(data)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError('not a score index: {}'.format(self.index))
+        body = data[INDEX_HEADER.size:INDEX_HEADER.size + count * RECORD.size]
+        return covered, [Run(*fields) for fields in RECORD.iter_unpack(body)]
+
+    def log_size(self):
+        try:
+            return path.getsize(self.log)
+        except FileNotFoundError:
+            return 0
+
+    def record(self, score, duration, seed):
+        """ 1回のゲームを log の最後に足す """
+        run = Run(int(score), int(duration), seed, time.time())
+        with self.lock():
+            self.append(run)
+        covered = self.read_index()[0]
+        if (self.log_size() - covered) // RECORD.size >= self.compact_every:
+            self.compact_later()
+        return run
+
+    def append(self, run):
+        """ log の最後に run を書く (lock() の中で呼ぶ) """
+        with open(self.log, 'ab') as f:
+            # 前に途中で落ちたレコードがあれば消す
+            size = f.tell()
+            if size % RECORD.size:
+                f.truncate(size - size % RECORD.size)
+            f.write(RECORD.pack(*run))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def top(self, n=10):
+        """ 上位 n 件 (idx と まだ idx に入っていない log の最後だけを読む) """
+        covered, ranking = self.read_index()
+        try:
+            with open(self.log, 'rb') as f:
+                recent = heapq.nlargest(n, read_runs(f, covered),
+                                        key=score_of)
+        except FileNotFoundError:
+            recent = []
+        return heapq.nlargest(n, ranking[:n] + recent, key=score_of)
+
+    def best(self):
+        """ 一番高いスコア (記録がなければ 0) """
+        runs = self.top(1)
+        return runs[0].score if runs else 0
+
+    def runs(self):
+        """ 全ての記録 (古い順) """
+        try:
+            with open(self.log, 'rb') as f:
+                yield from read_runs(f)
+        except FileNotFoundError:
+            return
+
+    def compact(self):
+        """ idx に log の新しいレコードを入れて 上位 keep 件だけ残す """
+        with self.lock():
+            covered, ranking = self.read_index()
+            size = self.log_size()
+            size -= size % RECORD.size
+            if size == covered:
+                return
+            with open(self.log, 'rb') as f:
+                ranking = heapq.nlargest(
+                    self.keep, ranking + list(read_runs(f, covered, size)),
+                    key=score_of)
+            data = b''.join([INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION,
+                                               size, len(ranking))] +
+                            [RECORD.pack(*run) for run in ranking])
+            atomic_write(self.index, data)
+
+    def compact_later(self):
+        """ 別のスレッドで compact する (もう動いていれば何もしない) """
+        if self.compactor is not None and self.compactor.is_alive():
+            return
+        self.compactor = threading.Thread(target=self.compact, daemon=True,
+                                          name='scores')
+        self.compactor.start()
+
+    def wait(self):
+        """ compact が終わるまで待つ """
+        if self.compactor is not None:
+            self.compactor.join()
+
+    def migrate(self, filename):
+        """ 昔の highscore.txt のスコアを記録に入れる (記録がまだないときだけ)
+
+        ほかのプロセスが同時に移しても二重にならないように
+        記録があるかを見てから書くまで lock を持ったままにする
+        """
+        with self.lock():
+            if self.log_size() or not path.exists(filename):
+                return
+            with open(filename, 'r') as f:
+                try:
+                    score = int(f.read())
+                except ValueError:
+                    return
+            if score > 0:
+                self.append(Run(score, 0, 0, time.time()))
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    store = ScoreStore(SCORE_DIR or path.dirname(path.abspath(__file__)))
+    for rank, run in enumerate(store.top(n), 1):
+        print('{:3}. {:8} {:6.0f}s  seed {}  {}'.format(
+            rank, run.score, run.duration / 1000, run.seed,
+            time.strftime('%Y-%m-%d %H:%M', time.localtime(run.time))))
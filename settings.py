@@ -3,21 +3,97 @@ TITLE = "Jumpy!"
 WIDTH = 480
 HEIGHT = 600
 FPS = 60
+FIXED_DT = 1000 / FPS  # 1ステップで進むゲーム内の時間 (millisecond)
 FONT_NAME = 'arial'
-HS_FILE = "highscore.txt"
+TEXT_CACHE_SIZE = 64  # 取っておく文字の画像の数
+HS_FILE = "highscore.txt"  # 昔のハイスコア (最初に scores.log へ移す)
+# スコアの記録 (SCORE_DIR が None ならゲームのフォルダ、共有フォルダも使える)
+SCORE_DIR = None
+SCORE_LOG = "scores.log"
+SCORE_INDEX = "scores.idx"
+SCORE_LOCK = "scores.lock"
+SCORE_KEEP = 100  # ランキングに残す数
+SCORE_COMPACT_EVERY = 50  # ランキングに入れていない記録がこれだけ溜まったら作り直す
+REPLAY_FILE = "last_run.jmp"  # 最後にプレイしたゲームの記録
+# プレイの記録 (telemetry.py  ジャンプ, 着地, ゲームオーバーの理由, フレームの時間など)
+TELEMETRY = True  # python main.py で遊んだときに記録するか
+TELEMETRY_DIR = None  # None ならゲームのフォルダの telemetry/
+TELEMETRY_BUFFER = 65536  # 書き出すまで取っておくイベントの数 (あふれたら捨てる)
+TELEMETRY_FLUSH = 1.0  # 書き出す間隔 (秒)
+TELEMETRY_ROTATE = 4 * 1024 * 1024  # この大きさ (byte) を超えたら次のファイル
 SPRITESHEET = "spritesheet_jumper.png"
+ASSET_WORKERS = 4  # 画像をデコードするスレッドの数
+# 透明の描き方 'colorkey' (RLEACCEL), 'alpha' (per-pixel alpha),
+# 'auto' (画面のピクセル形式ごとに 最初の画像で blit して速い方)
+SURFACE_MODE = 'auto'
+SURFACE_TRIALS = 20  # 'auto' で速さを比べるときの blit の回数
+STARTUP_BUDGET_MS = 500  # スタート画面が出るまでの目標時間
+# 効果音: 名前 -> (snd/ のファイル, 種類, 音量)  snd/ の音は全て先に読み込む
+SOUNDS = {
+    'jump': ('Jump33.wav', 'player', 0.1),
+    'jump2': ('Jump40.wav', 'player', 0.1),
+    'boost': ('Boost16.wav', 'pickup', 0.1),
+    'powerup': ('sfx_sounds_powerup16.wav', 'pickup', 0.1),
+}
+# 種類 -> (使うチャンネルの数, 同じ音を続けて鳴らさない時間 millisecond)
+SOUND_CHANNELS = {'player': (2, 50), 'pickup': (2, 100)}
+SOUND_FREE_CHANNELS = 4  # どの種類でもないチャンネル
+MUSIC_FADE = 500  # 音楽を変えるときのクロスフェードの時間 (millisecond)
+# 変わったところだけ描き直す (fill-rateが遅いPC向け)
+DIRTY_RENDER = False
+# ゲームループ
+# 'fixed': ステップは FPS で一定、描画は RENDER_FPS (間の位置を補間して描く)
+# 'lockstep': 1ステップごとに1回描く (描画が遅いとゲームも遅くなる)
+LOOP_MODE = 'fixed'
+# 描画の最大の回数/秒 (vsync のときは画面に合わせる)
+# 120/144Hz の画面では上げると 補間した位置でなめらかに描く
+RENDER_FPS = FPS
+VSYNC = False  # 画面の更新に合わせて描く (pg.SCALED の window になる)
+MAX_FRAME_SKIP = 5  # 描画1回で進める最大のステップ数 (もっと遅れたらゲームを遅くする)
+INTERPOLATE = True
+INTERP_SNAP = HEIGHT // 2  # 1ステップでこれ以上動いた sprite は補間しない
+
+# フレームの時間を測る (F3 で画面の表示を切り替え)
+PROFILE = False
+PROFILE_OVERLAY = True
+PROFILE_WINDOW = 600  # 何フレーム分の時間から p50/p95/p99 を出すか
+PROFILE_REFRESH = 30  # 何フレームごとに表示を更新するか
+PROFILE_TRACE_LIMIT = 200000  # chrome trace に残す記録の数
+PROFILE_CSV = "profile.csv"  # ゲームオーバーのときに書き出す
+PROFILE_TRACE = "profile_trace.json"
 
 # Player properties
 PLAYER_ACC = 0.5
 PLAYER_FRICTION = -0.12
 PLAYER_GRAV = 0.8
 PLAYER_JUMP = 24
+PLAYER_WALK_FRAME = 200  # 歩くアニメーションの1コマ (millisecond)
+PLAYER_IDLE_FRAME = 350  # 立っているときのアニメーションの1コマ
 
 # Game properties
 BOOST_POWER = 60
 POW_SPAWN_PCT = 20  # 登場する頻度
 MOB_FREQ = 5000  # millisecond
-CLOUD_FREQ = 15
+CLOUD_FREQ = 15  # CLOUD_STRIPS = False のとき (見た目だけなので sweep では変えられない)
+# 雲をまとめて背景の帯の画像に描く (雲が多くても blit は1フレームに2回)
+# False なら 雲は1つずつ sprite (スクロール中に CLOUD_FREQ % の確率で出る)
+CLOUD_STRIPS = True
+CLOUD_DENSITY = 8  # 帯 (高さ HEIGHT) ごとの雲の数
+
+# レベルの生成 (False なら 毎フレーム platform を6個になるまで足していく)
+LEVEL_GENERATOR = True
+CHUNK_HEIGHT = HEIGHT  # 一度に作る高さ (pixel)
+LEVEL_LOOKAHEAD = 3  # 別のスレッドで先に作っておく chunk の数
+LEVEL_MARGIN = HEIGHT // 2  # 画面の上 どこまで platform を置いておくか
+LEVEL_RAMP = 20  # 一番難しくなるまでの chunk の数
+LEVEL_GAP_EASY = (40, 110)  # platform の縦の間隔 (最初)
+LEVEL_GAP_HARD = (90, 220)  # platform の縦の間隔 (一番難しいとき)
+LEVEL_MOBS = 2  # 一番難しいときの chunk ごとの mob の数
+LEVEL_SAFETY = 0.8  # 届くかどうかを調べるときの余裕
+LEVEL_TRIES = 20  # 届かない chunk を作り直す回数
+
+# 衝突判定の候補を探すときの帯の高さ (pixel)
+BAND_HEIGHT = 64
 
 # LAYER 描かれる順番
 PLAYER_LAYER = 2
@@ -25,6 +101,7 @@ PLATFORM_LAYER = 1
 POW_LAYER = 1
 MOB_LAYER = 2
 CLOUD_LAYER = 0
+HUD_LAYER = 3
 
 # Starting platforms
 PLATFORM_LIST = [(0, HEIGHT - 50),
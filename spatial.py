@@ -0,0 +1,61 @@
+# 衝突判定の broad-phase (近くにある sprite だけを候補にする)
+import pygame as pg
+
+from settings import BAND_HEIGHT
+
+
+class BandGroup(pg.sprite.Group):
+    """ y方向の帯(band)ごとに sprite を分けて持つ Group
+
+    near(rect) は rect と同じ帯にいる sprite だけを返すので、
+    そのあとの rect やマスクの判定は近くの sprite だけで済む。
+    rect は world座標なのでスクロールしても帯は変わらない。
+    帯は Group に入れたときに決めるので 動かない sprite (platform, POWERUP) に使う
+    (動く mob は MobState.near で探す)。
+    """
+
+    def __init__(self, *sprites, band_height=BAND_HEIGHT):
+        self.band_height = band_height
+        self.bands = {}  # 帯の番号 -> {sprite: None} (入った順番を保つ)
+        self.band_of = {}  # sprite -> (最初の帯, 最後の帯)
+        super().__init__(*sprites)
+
+    def band_range(self, rect):
+        """ rect が入っている帯の範囲 (最初の帯, 最後の帯) """
+        return (rect.top // self.band_height,
+                (rect.top + max(rect.height, 1) - 1) // self.band_height)
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        self.insert(sprite, self.band_range(sprite.rect))
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        self.discard(sprite)
+
+    def insert(self, sprite, band_range):
+        self.band_of[sprite] = band_range
+        first, last = band_range
+        for band in range(first, last + 1):
+            self.bands.setdefault(band, {})[sprite] = None
+
+    def discard(self, sprite):
+        band_range = self.band_of.pop(sprite, None)
+        if band_range is None:
+            return
+        first, last = band_range
+        for band in range(first, last + 1):
+            members = self.bands[band]
+            del members[sprite]
+            if not members:
+                del self.bands[band]
+
+    def near(self, rect):
+        """ rect と同じ帯にいる sprite のリスト (衝突判定の候補) """
+        first, last = self.band_range(rect)
+        if first == last:
+            return list(self.bands.get(first, ()))
+        found = {}
+        for band in range(first, last + 1):
+            found.update(self.bands.get(band, {}))
+        return list(found)
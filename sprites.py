@@ -1,23 +1,132 @@
 # Sprite classes
 import pygame as pg
 from settings import *
-import random
+from array import array
+from os import path
+from time import perf_counter
+from xml.etree import ElementTree
+from telemetry import JUMP
 
 vec = pg.math.Vector2
 
 
+def read_atlas(filename):
+    """ atlas(xml)から 名前 -> (x, y, width, height) の辞書を作る """
+    frames = {}
+    for sub in ElementTree.parse(filename).getroot().iter('SubTexture'):
+        frames[sub.get('name')] = tuple(
+            int(sub.get(key)) for key in ('x', 'y', 'width', 'height'))
+    return frames
+
+
+def convert_image(image):
+    """ 画面があれば画面のピクセル形式に変換 (headlessではそのまま返す) """
+    if pg.display.get_surface() is None:
+        return image
+    return image.convert()
+
+
+def blit_time(image, target, trials=SURFACE_TRIALS):
+    """ image を target に trials 回 blit する時間 """
+    target.blit(image, (0, 0))  # RLE の圧縮は最初の blit で行われる
+    start = perf_counter()
+    for i in range(trials):
+        target.blit(image, (0, 0))
+    return perf_counter() - start
+
+
+def asset_mode(image, mode=SURFACE_MODE):
+    """ アセット (spritesheet や 雲の画像) 1つに使う mode を決める
+
+    'auto' なら その画像で実際に blit して 'alpha' か 'colorkey' の速い方を選ぶ
+    (透明な部分の多さで速さが変わるので アセットを読み込むときに一つずつ測り、
+    そのアセットから作る画像は結果を使う)
+    """
+    if mode != 'auto' or pg.display.get_surface() is None:
+        return mode
+    keyed = image.convert()
+    keyed.set_colorkey((0, 0, 0), pg.RLEACCEL)
+    target = pg.Surface(keyed.get_size()).convert()
+    if blit_time(keyed.convert_alpha(), target) < blit_time(keyed, target):
+        return 'alpha'
+    return 'colorkey'
+
+
+def finalize_image(image, mode=SURFACE_MODE):
+    """ 黒 (0, 0, 0) を透明にして 画面のピクセル形式に変換する
+
+    mode が 'colorkey' なら RLEACCEL 付きの colorkey、'alpha' なら
+    per-pixel alpha、'auto' なら asset_mode() で この画像を測って速い方
+    (headlessでは colorkey を付けるだけ)
+    """
+    if pg.display.get_surface() is None:
+        image.set_colorkey((0, 0, 0))
+        return image
+    if mode == 'auto':
+        mode = asset_mode(image)
+    keyed = image.convert()
+    keyed.set_colorkey((0, 0, 0), pg.RLEACCEL)
+    if mode == 'alpha':
+        return keyed.convert_alpha()
+    return keyed
+
+
 class SpriteSheet:
-    def __init__(self, filename):
-        """ SpriteSheet専用クラス"""
-        self.spritesheet = pg.image.load(filename).convert()
-
-    def get_image(self, x, y, width, height):
-        """ spritesheetの中の特定の画像を切り取る """
-        image = pg.Surface((width, height))
-        image.blit(self.spritesheet, (0, 0), (x, y, width, height))
-        image = pg.transform.scale(image, (width // 2, height // 2))
+    def __init__(self, filename, image=None):
+        """ SpriteSheet専用クラス
+
+        image にデコード済みの画像を渡すと filename は atlas を探すだけに使う
+        """
+        if image is None:
+            image = convert_image(pg.image.load(filename))
+        self.spritesheet = image
+        # 切り取った画像の mode (画像は半分の大きさにするので 半分にして測る)
+        width, height = image.get_size()
+        self.mode = asset_mode(
+            pg.transform.scale(image, (width // 2, height // 2)))
+        # 切り取り済みの画像のキャッシュ (同じ画像を何度も作らない)
+        self.cache = {}
+        # 画像ごとの衝突判定用マスク (画像と同じく一度だけ作る)
+        self.masks = {}
+        # xml の atlas から名前付きの領域を読み込む
+        self.frames = {}
+        atlas = path.splitext(filename)[0] + '.xml'
+        if path.exists(atlas):
+            self.load_atlas(atlas)
+
+    def load_atlas(self, filename):
+        """ atlas(xml)から 名前 -> (x, y, width, height) を読み込む """
+        self.frames.update(read_atlas(filename))
+
+    def get_image(self, x, y, width, height, flip=False):
+        """ spritesheetの中の特定の画像を切り取る (一度だけ作って共有する)
+
+        返す画像は共有されるので、呼び出し側で変更しないこと
+        """
+        key = (x, y, width, height, flip)
+        image = self.cache.get(key)
+        if image is None:
+            image = pg.Surface((width, height))
+            image.blit(self.spritesheet, (0, 0), (x, y, width, height))
+            image = pg.transform.scale(image, (width // 2, height // 2))
+            if flip:
+                image = pg.transform.flip(image, True, False)
+            image = finalize_image(image, self.mode)  # 背景を消す
+            self.cache[key] = image
         return image
 
+    def get_frame(self, name, flip=False):
+        """ atlasの名前で画像を取得 """
+        return self.get_image(*self.frames[name], flip=flip)
+
+    def get_mask(self, image):
+        """ 画像の衝突判定用マスクを取得 (画像ごとに一度だけ作る) """
+        mask = self.masks.get(image)
+        if mask is None:
+            mask = pg.mask.from_surface(image)
+            self.masks[image] = mask
+        return mask
+
 
 # noinspection PyArgumentList
 class Player(pg.sprite.Sprite):
@@ -26,8 +135,10 @@ class Player(pg.sprite.Sprite):
         self.groups = game.all_sprites
         super().__init__(self.groups)
         self.game = game
+        self.camera = game.camera
         self.walking = False
         self.jumping = False
+        self.standing = False  # 前のステップで platform の上にいたか
         self.standing_frames = []
         self.walk_frames_r = []
         self.walk_frames_l = []
@@ -35,7 +146,10 @@ class Player(pg.sprite.Sprite):
         self.load_images()
         self.current_frame = 0  # to keep track of animation frame
         self.last_update = 0  # to keep time of animation
+        self.anim_state = None  # 'walk', 'idle', None (ジャンプ中)
+        self.animation = None  # 次のフレームに進む予定 (scheduler.Timer)
         self.image = self.standing_frames[0]
+        self.mask = self.game.spritesheet.get_mask(self.image)
         self.rect = self.image.get_rect()
         self.rect.center = (40, HEIGHT - 100)
         self.pos = vec(40, HEIGHT - 100)
@@ -43,37 +157,29 @@ class Player(pg.sprite.Sprite):
         self.acc = vec(0, 0)
 
     def load_images(self):
-        """アニメーションのフレーム画像をロード"""
+        """アニメーションのフレーム画像をロード (spritesheetのキャッシュを共有)"""
+        sheet = self.game.spritesheet
 
         # 立っているときのフレーム
         self.standing_frames = [
-            self.game.spritesheet.get_image(614, 1063, 120, 191),
-            self.game.spritesheet.get_image(690, 406, 120, 201),
+            sheet.get_frame('bunny1_ready.png'),
+            sheet.get_frame('bunny1_stand.png'),
         ]
-        # 個々のフレーム画像の背景を消す
-        for frame in self.standing_frames:
-            frame.set_colorkey((0, 0, 0))
 
         # 右を向いて歩いているときのフレーム
         self.walk_frames_r = [
-            self.game.spritesheet.get_image(678, 860, 120, 201),
-            self.game.spritesheet.get_image(692, 1458, 120, 207),
+            sheet.get_frame('bunny1_walk1.png'),
+            sheet.get_frame('bunny1_walk2.png'),
         ]
-        # 個々のフレーム画像の背景を消す
-        for frame in self.walk_frames_r:
-            frame.set_colorkey((0, 0, 0))
 
-        # 左を向いて歩いているときのフレーム
-        self.walk_frames_l = []
-
-        # 個々のフレーム画像の背景を消す
-        for frame in self.walk_frames_r:
-            frame.set_colorkey((0, 0, 0))
-            self.walk_frames_l.append(pg.transform.flip(frame, True, False))
+        # 左を向いて歩いているときのフレーム (左右反転)
+        self.walk_frames_l = [
+            sheet.get_frame('bunny1_walk1.png', flip=True),
+            sheet.get_frame('bunny1_walk2.png', flip=True),
+        ]
 
         # jumpしているときのフレーム
-        self.jump_frame = self.game.spritesheet.get_image(382, 763, 150, 181)
-        self.jump_frame.set_colorkey((0, 0, 0))
+        self.jump_frame = sheet.get_frame('bunny1_jump.png')
 
     def jump_cut(self):
         if self.jumping:
@@ -83,25 +189,28 @@ class Player(pg.sprite.Sprite):
     def jump(self):
         # jump only if on a platform
         self.rect.y += 2
-        hits = pg.sprite.spritecollide(self, self.game.platforms, False)
+        hits = pg.sprite.spritecollide(
+            self, self.game.platforms.near(self.rect), False)
         self.rect.y -= 2
         if hits and not self.jumping:
-            self.game.jump_sound.play()
+            self.game.audio.play('jump')
+            self.game.telemetry.emit(JUMP, self.game.now)
             self.jumping = True
-            self.vel.y = -PLAYER_JUMP
+            self.vel.y = -self.game.config.player_jump
 
     def update(self):
         self.animate()
+        config = self.game.config
         # 重力の設定
-        self.acc = vec(0, PLAYER_GRAV)
-        keys = pg.key.get_pressed()
-        if keys[pg.K_LEFT]:
-            self.acc.x = -PLAYER_ACC
-        if keys[pg.K_RIGHT]:
-            self.acc.x = PLAYER_ACC
+        self.acc = vec(0, config.player_grav)
+        inp = self.game.input
+        if inp.left:
+            self.acc.x = -config.player_acc
+        if inp.right:
+            self.acc.x = config.player_acc
 
         # 摩擦を計算
-        self.acc.x += self.vel.x * PLAYER_FRICTION
+        self.acc.x += self.vel.x * config.player_friction
         # Velocity に Accelerationを足す
         self.vel += self.acc
 
@@ -122,136 +231,317 @@ class Player(pg.sprite.Sprite):
         self.rect.midbottom = self.pos
 
     def animate(self):
-        """アニメーション"""
-        now = pg.time.get_ticks()  # 現在のtick(時間)を取得
-        if self.vel.x != 0:
-            self.walking = True
+        """ アニメーションの状態 (歩く / 立つ / ジャンプ) が変わったら
+        次のフレームに進む予定を game.scheduler に入れ直す
+        """
+        self.walking = self.vel.x != 0
+        if self.walking:
+            state = 'walk'
+        elif not self.jumping:
+            state = 'idle'
+        else:
+            state = None  # ジャンプ中はフレームを変えない
+        if state == self.anim_state:
+            return
+        self.anim_state = state
+        if self.animation is not None:
+            self.animation.cancel()
+            self.animation = None
+        if state is not None:
+            # 最後にフレームを変えてから 1コマの時間が過ぎたら
+            self.animation = self.game.scheduler.at(
+                self.last_update + self.frame_time(), self.next_frame)
+
+    def frame_time(self):
+        if self.anim_state == 'walk':
+            return PLAYER_WALK_FRAME
+        return PLAYER_IDLE_FRAME
+
+    def next_frame(self):
+        """ 次のフレームの画像に変える (scheduler から呼ばれる) """
+        now = self.game.now
+        self.last_update = now
+        if self.anim_state == 'walk':
+            # 歩くアニメーション
+            self.current_frame = (self.current_frame + 1) % len(
+                self.walk_frames_l)  # フレーム画像の配列番号を計算
+            if self.vel.x > 0:
+                self.set_image(self.walk_frames_r[self.current_frame])
+            else:
+                self.set_image(self.walk_frames_l[self.current_frame])
         else:
-            self.walking = False
+            # アイドルアニメーション
+            self.current_frame = (self.current_frame + 1) % len(
+                self.standing_frames)  # フレーム画像の配列番号を計算
+            # 地面に必ず足がついているように画像が変更になる前のbottom を保つ
+            self.set_image(self.standing_frames[
+                self.current_frame])  # imageを計算したフレームに画像に変更
+        self.animation = self.game.scheduler.at(now + self.frame_time(),
+                                                self.next_frame)
+
+    def set_image(self, image):
+        """画像を変更して 足の位置(midbottom)と衝突判定用のマスクを合わせる
+
+        scheduler から Player.update のあとに呼ばれても 位置が変わらないように
+        bottom だけでなく 横の位置も保つ
+        """
+        midbottom = self.rect.midbottom  # フレームごとにimageのサイズが変更になるかもしれないから
+        self.image = image
+        # 衝突判定用のマスクは作り直さずにキャッシュから参照を入れ替える
+        self.mask = self.game.spritesheet.get_mask(image)
+        self.rect = self.image.get_rect(midbottom=midbottom)
+
+
+class PooledSprite(pg.sprite.Sprite):
+    """ kill()されたら pool に戻って 次の spawn() で使い回される sprite
+
+    __init__ では毎回同じもの (layer, 画像など) だけを用意して、
+    登場するたびに変わるものは reset() で設定する。
+    たくさん作られるので 属性は __slots__ に入れる
+    (pg.sprite.Sprite の __dict__ には Group の情報だけが入る)。
+    """
+    __slots__ = ('game', 'camera', 'rect', 'image')
 
-        # 歩くアニメーション
-        if self.walking:
-            if now - self.last_update > 200:
-                self.last_update = now
-                self.current_frame = (self.current_frame + 1) % len(
-                    self.walk_frames_l)  # フレーム画像の配列番号を計算
-                bottom = self.rect.bottom
-                if self.vel.x > 0:
-                    self.image = self.walk_frames_r[self.current_frame]
-                else:
-                    self.image = self.walk_frames_l[self.current_frame]
-                self.rect = self.image.get_rect()
-                self.rect.bottom = bottom
-
-        # アイドルアニメーション
-        if not self.jumping and not self.walking:
-            if now - self.last_update > 350:  # 現在と最後にupdateした時間を比較
-                self.last_update = now  # もしそうだったらlast_updateをnow(現在)に設定
-                self.current_frame = (self.current_frame + 1) % len(
-                    self.standing_frames)  # フレーム画像の配列番号を計算
-                bottom = self.rect.bottom  # フレームごとにimageのサイズが変更になるかもしれないから
-                # 地面に必ず足がついているように画像が変更になる前のbottom を取得
-                self.image = self.standing_frames[
-                    self.current_frame]  # imageを計算したフレームに画像に変更
-                self.rect = self.image.get_rect()  # rectを新たに取得
-                self.rect.bottom = bottom  # rectのbottomを更新
-
-        # 衝突判定用のマスク
-        self.mask = pg.mask.from_surface(self.image)
-
-
-class Platform(pg.sprite.Sprite):
-    def __init__(self, game, x, y):
-        self._layer = PLATFORM_LAYER
-        self.groups = game.all_sprites, game.platforms
-        super().__init__(self.groups)
+    def __init__(self, game):
+        super().__init__()  # Groupにはrectが決まってから入れる (帯の計算に使う)
         self.game = game
-        # spritesheetから地面の画像を２つ取得
-        images = [self.game.spritesheet.get_image(0, 288, 380, 94),
-                  self.game.spritesheet.get_image(213, 1662, 201, 100)]
-        self.image = random.choice(images)  # 2つのうち１つをランダムに取得
-        self.image.set_colorkey((0, 0, 0))  # 背景を消す
-        self.rect = self.image.get_rect()
+
+    @classmethod
+    def spawn(cls, game, *args):
+        """ pool に残っていれば使い回し、なければ新しく作る """
+        pool = game.pools.setdefault(cls, [])
+        sprite = pool.pop() if pool else cls(game)
+        sprite.reset(*args)
+        # Group と camera は新しいゲームになると変わるので毎回入れ直す
+        sprite.camera = game.camera
+        sprite.add(sprite.spawn_groups())
+        return sprite
+
+    def spawn_groups(self):
+        """ 登場しているあいだ入る Group (reset() のあとに呼ばれる) """
+        raise NotImplementedError
+
+    def reset(self, *args):
+        raise NotImplementedError
+
+    def kill(self):
+        if self.alive():
+            super().kill()
+            self.game.pools[type(self)].append(self)
+
+
+class Platform(PooledSprite):
+    __slots__ = ('frame', 'pow')
+    _layer = PLATFORM_LAYER
+
+    def spawn_groups(self):
+        return self.game.all_sprites, self.game.platforms
+
+    def reset(self, x, y, frame=None):
+        # 地面の画像２つのうち１つをランダムに取得 (frame で指定もできる)
+        if frame is None:
+            frame = self.game.rng.choice(
+                ['ground_grass.png', 'ground_grass_small.png'])
+        self.frame = frame
+        self.pow = None  # のっている POWERUP
+        self.image = self.game.spritesheet.get_frame(frame)
+        if not hasattr(self, 'rect'):
+            self.rect = self.image.get_rect()
+        self.rect.size = self.image.get_size()
         self.rect.x = x
         self.rect.y = y
-        if random.randrange(100) < POW_SPAWN_PCT:
-            Pow(self.game, self)
 
+    @classmethod
+    def spawn(cls, game, x, y, frame=None, pow=None):
+        """ pow を省略すると pow_spawn_pct の確率で POWERUP をのせる """
+        plat = super().spawn(game, x, y, frame)
+        if pow is None:
+            pow = game.rng.randrange(100) < game.config.pow_spawn_pct
+        if pow:
+            Pow.spawn(game, plat)
+        return plat
 
-class Pow(pg.sprite.Sprite):
-    def __init__(self, game, plat):
-        self._layer = POW_LAYER
-        self.groups = game.all_sprites, game.powerups
-        super().__init__(self.groups)
-        self.game = game
-        self.plat = plat
-        self.type = random.choice(['boost'])
-        self.image = self.game.spritesheet.get_image(820, 1805, 71, 70)
-        self.image.set_colorkey((0, 0, 0))  # 背景を消す
+    def kill(self):
+        # のっている POWERUP も一緒に消える
+        if self.pow is not None:
+            self.pow.kill()
+        super().kill()
+
+
+class Pow(PooledSprite):
+    __slots__ = ('plat', 'type')
+    _layer = POW_LAYER
+
+    def __init__(self, game):
+        super().__init__(game)
+        self.image = self.game.spritesheet.get_frame('powerup_jetpack.png')
         self.rect = self.image.get_rect()
+        self.plat = None
+        self.type = None
+
+    def spawn_groups(self):
+        return self.game.all_sprites, self.game.powerups
+
+    def reset(self, plat):
+        self.plat = plat
+        plat.pow = self
+        self.type = self.game.rng.choice(['boost'])
+        # platform は world座標で動かないので 位置は最初に決めるだけ
         self.rect.centerx = self.plat.rect.centerx
         self.rect.bottom = self.plat.rect.top - 5
 
-    def update(self):
-        self.rect.bottom = self.plat.rect.top - 5
-        if not self.game.platforms.has(self.plat):
-            self.kill()
+    def kill(self):
+        super().kill()
+        if self.plat is not None and self.plat.pow is self:
+            self.plat.pow = None
+        self.plat = None  # 消えた platform を持ち続けない
+
+
+class MobState:
+    """ 全ての Mob の位置と速さ (struct of arrays)
 
+    Mob は作られたときに index をもらい、ずっと同じ行を使う (pool に戻っても)。
+    update() で生きている全ての Mob を1つのループで動かす
+    (Mob ごとの update() の呼び出しはない)。
+    """
 
-class Mob(pg.sprite.Sprite):
     def __init__(self, game):
-        self._layer = MOB_LAYER
-        self.groups = game.all_sprites, game.mobs
-        super().__init__(self.groups)
-        self.game = game
-        self.image_up = self.game.spritesheet.get_image(566, 510, 122, 139)
-        self.image_up.set_colorkey((0, 0, 0))
-        self.image_down = self.game.spritesheet.get_image(568, 1534, 122, 139)
-        self.image_down.set_colorkey((0, 0, 0))
-        self.image = self.image_up
-        self.rect = self.image.get_rect()
-        self.rect.centerx = random.choice([-100, WIDTH + 100])
-        self.vx = random.randrange(1, 4)
-        if self.rect.centerx > WIDTH:
-            self.vx *= -1
-        self.rect.y = random.randrange(HEIGHT / 2)
-        self.vy = 0
-        self.dy = 0.5
+        sheet = game.spritesheet
+        # 0: 上へ動いているとき 1: 下へ動いているとき
+        self.images = (sheet.get_frame('flyMan_fly.png'),
+                       sheet.get_frame('flyMan_jump.png'))
+        self.masks = tuple(sheet.get_mask(image) for image in self.images)
+        self.sizes = tuple(image.get_size() for image in self.images)
+        self.half_heights = tuple(h // 2 for w, h in self.sizes)
+        self.mobs = []  # index -> Mob
+        self.x = array('l')  # rect.x
+        self.y = array('l')  # rect.y
+        self.vx = array('l')
+        self.vy = array('d')
+        self.dy = array('d')
+        self.frame = array('b')  # images の番号
+        self.live = {}  # 生きている Mob の index (出てきた順)
+
+    def allocate(self, mob):
+        """ 新しい Mob の index (全ての配列に1行足す) """
+        for column in (self.x, self.y, self.vx, self.vy, self.dy, self.frame):
+            column.append(0)
+        self.mobs.append(mob)
+        return len(self.mobs) - 1
+
+    def start(self, index, rect, vx):
+        """ 出てきた Mob の状態を入れる (上へ動く画像から始める) """
+        self.x[index] = rect.x
+        self.y[index] = rect.y
+        self.vx[index] = vx
+        self.vy[index] = 0
+        self.dy[index] = 0.5
+        self.frame[index] = 0
+        self.live[index] = None
 
     def update(self):
-        self.rect.x += self.vx
-        self.vy += self.dy
-        if self.vy > 3 or self.vy < -3:
-            self.dy *= -1
-        center = self.rect.center
-        if self.dy < 0:
-            self.image = self.image_up
-        else:
-            self.image = self.image_down
-        # 衝突判定用のマスク
-        self.mask = pg.mask.from_surface(self.image)
-        self.rect = self.image.get_rect()
-        self.rect.center = center
-        self.rect.y += self.vy
-        if self.rect.left > WIDTH + 100 or self.rect.right < -100:
-            self.kill()
+        """ Mob の左右の動きと上下の揺れ (前の Mob.update と同じ動き) """
+        x, y, vx, vy, dy, frames = (self.x, self.y, self.vx, self.vy,
+                                    self.dy, self.frame)
+        mobs = self.mobs
+        gone = []
+        for i in self.live:
+            rect = mobs[i].rect
+            left = x[i] = x[i] + vx[i]
+            v = vy[i] = vy[i] + dy[i]
+            if v > 3 or v < -3:
+                dy[i] = -dy[i]
+            frame = 0 if dy[i] < 0 else 1
+            top = y[i]
+            if frame != frames[i]:
+                # 画像を入れ替えるときは 中心が変わらないようにする
+                top += self.half_heights[frames[i]] - self.half_heights[frame]
+                frames[i] = frame
+                mob = mobs[i]
+                mob.image = self.images[frame]
+                mob.mask = self.masks[frame]
+                rect.size = self.sizes[frame]
+            # float は rect が丸める
+            rect.topleft = (left, top + v)
+            y[i] = rect.y
+            if rect.left > WIDTH + 100 or rect.right < -100:
+                gone.append(mobs[i])
+        for mob in gone:
+            mob.kill()
+
+    def near(self, rect):
+        """ rect と重なっている Mob (衝突判定の候補) """
+        mobs = self.mobs
+        return [mobs[i] for i in self.live if mobs[i].rect.colliderect(rect)]
+
+
+class Mob(PooledSprite):
+    """ 位置と速さは game.mob_state の index の行にある """
+    __slots__ = ('index', 'mask')
+    _layer = MOB_LAYER
 
-
-class Cloud(pg.sprite.Sprite):
     def __init__(self, game):
-        self._layer = CLOUD_LAYER
-        self.groups = game.all_sprites, game.clouds
-        super().__init__(self.groups)
-        self.game = game
-        self.image = random.choice(self.game.cloud_images)
-        self.image.set_colorkey((0, 0, 0))
-        self.rect = self.image.get_rect()
-        scale = random.randrange(50, 101) / 100
-        self.image = pg.transform.scale(self.image, (
-            int(self.rect.width * scale), int(self.rect.height * scale)))
-        self.rect.x = random.randrange(WIDTH - self.rect.width)
-        self.rect.y = random.randrange(-500, -50)
+        super().__init__(game)
+        self.rect = game.mob_state.images[0].get_rect()
+        self.index = game.mob_state.allocate(self)
+
+    def spawn_groups(self):
+        return self.game.all_sprites, self.game.mobs
+
+    @property
+    def vx(self):
+        return self.game.mob_state.vx[self.index]
+
+    def reset(self, slot=None):
+        """ slot (level.MobSlot) を省略すると 出てくる位置をランダムに決める """
+        state = self.game.mob_state
+        self.image = state.images[0]
+        self.mask = state.masks[0]
+        self.rect.size = self.image.get_size()
+        if slot is None:
+            self.rect.centerx = self.game.rng.choice([-100, WIDTH + 100])
+            vx = self.game.rng.randrange(1, 4)
+            if self.rect.centerx > WIDTH:
+                vx *= -1
+            self.rect.y = (self.game.camera.y +
+                           self.game.rng.randrange(HEIGHT // 2))
+        else:
+            self.rect.centerx = -100 if slot.side < 0 else WIDTH + 100
+            vx = -slot.side * slot.vx
+            self.rect.y = slot.y
+        state.start(self.index, self.rect, vx)
+
+    def kill(self):
+        super().kill()
+        self.game.mob_state.live.pop(self.index, None)
+
+
+class Cloud(PooledSprite):
+    __slots__ = ()
+    _layer = CLOUD_LAYER
+
+    @classmethod
+    def spawn(cls, game):
+        cloud = super().spawn(game)
+        cloud.camera = game.cloud_camera  # 雲は背景のカメラ
+        return cloud
+
+    def spawn_groups(self):
+        return self.game.all_sprites, self.game.clouds
+
+    def reset(self):
+        image = self.game.rng.choice(self.game.cloud_images)
+        # rect は元の画像の大きさのまま
+        if not hasattr(self, 'rect'):
+            self.rect = image.get_rect()
+        self.rect.size = image.get_size()
+        scale = self.game.rng.randrange(50, 101) / 100
+        self.image = self.game.scaled_cloud(image, scale)
+        self.rect.x = self.game.rng.randrange(WIDTH - self.rect.width)
+        self.rect.y = (self.game.cloud_camera.y +
+                       self.game.rng.randrange(-500, -50))
 
     def update(self, *args):
-        if self.rect.top > HEIGHT * 2:  # 落ちて行くときも雲がある
+        # 落ちて行くときも雲がある
+        if self.rect.top - self.camera.y > HEIGHT * 2:
             self.kill()
@@ -0,0 +1,163 @@
+# 物理と登場の頻度のパラメータを 複数のプロセスで調べる
+#
+#   python sweep.py --grid player_jump=20,24,28 player_grav=0.6,0.8
+#   python sweep.py --random 50 --range player_jump=18:30 mob_freq=3000:8000
+#   python sweep.py ... --games 20 --minutes 5 --workers 8 --out sweep.npz
+#
+# 設定ごとに bot (bot.ClimbBot) が headless で games 回遊び、
+# score, 生き残った時間, ゲームオーバーの理由を集計して 列ごとの配列 (.npz) に書く。
+# 名前は config.TUNABLE (大文字でも小文字でもいい)。
+# cloud_freq は見た目だけなので もう変えられない (settings.py の CLOUD_FREQ)。
+#
+#   data = np.load('sweep.npz')
+#   plt.scatter(data['player_jump'], data['score_mean'])
+import argparse
+import itertools
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from settings import *
+from config import Config, DEFAULT_CONFIG, make_config
+from main import Game
+from bot import ClimbBot
+
+CAUSES = ['mob', 'fall', 'timeout']
+METRICS = ['score_mean', 'score_p50', 'score_max', 'survival_mean',
+           'survival_p50'] + ['deaths_' + cause for cause in CAUSES]
+
+
+def parse_value(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def parse_specs(specs, sep):
+    """ ['name=a,b', ...] -> {name: [a, b]} (sep は値の区切り) """
+    values = {}
+    for spec in specs:
+        name, _, text = spec.partition('=')
+        name = name.lower()
+        if name not in Config._fields or not text:
+            raise ValueError('bad setting: {}'.format(spec))
+        values[name] = [parse_value(v) for v in text.split(sep)]
+    return values
+
+
+def grid_configs(values, bases=(DEFAULT_CONFIG,)):
+    """ bases のそれぞれに values の全ての組み合わせを入れた Config """
+    names = list(values)
+    return [make_config(base, **dict(zip(names, combo))) for base in bases
+            for combo in itertools.product(*[values[n] for n in names])]
+
+
+def random_configs(ranges, count, seed=None):
+    """ 範囲 {name: [low, high]} の中からランダムに選んだ count 個の Config
+
+    low と high が両方 int なら int、そうでなければ float で選ぶ
+    """
+    rng = random.Random(seed)
+    configs = []
+    for i in range(count):
+        changes = {}
+        for name, (low, high) in ranges.items():
+            if isinstance(low, int) and isinstance(high, int):
+                changes[name] = rng.randint(low, high)
+            else:
+                changes[name] = rng.uniform(low, high)
+        configs.append(make_config(**changes))
+    return configs
+
+
+def play_config(task):
+    """ 1つの設定で games 回遊んで 集計した値の辞書を返す (プロセスの中で呼ばれる) """
+    config, games, steps, seed = task
+    game = Game(headless=True, config=config)
+    scores = []
+    survival = []
+    causes = dict.fromkeys(CAUSES, 0)
+    for i in range(games):
+        game.reset(seed + i)
+        game.simulate(steps, ClimbBot(config.player_jump, config.player_grav))
+        scores.append(game.score)
+        survival.append(game.now / 1000)
+        causes[game.death_cause or 'timeout'] += 1
+    result = {
+        'score_mean': np.mean(scores),
+        'score_p50': np.median(scores),
+        'score_max': np.max(scores),
+        'survival_mean': np.mean(survival),
+        'survival_p50': np.median(survival),
+    }
+    for cause in CAUSES:
+        result['deaths_' + cause] = causes[cause]
+    return result
+
+
+def sweep(configs, games, steps, workers=None, seed=0):
+    """ configs を process pool で調べて 列 (名前 -> 配列) を返す
+
+    同じ seed なら 設定ごとに同じゲーム (seed ~ seed + games - 1) を使う
+    """
+    tasks = [(config, games, steps, seed) for config in configs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(play_config, tasks))
+    columns = {name: np.array([getattr(c, name) for c in configs], dtype=float)
+               for name in Config._fields}
+    for metric in METRICS:
+        columns[metric] = np.array([r[metric] for r in results])
+    return columns
+
+
+def report(columns, count=10):
+    """ score_mean の高い順に count 個の設定を表示 """
+    order = np.argsort(-columns['score_mean'])[:count]
+    names = list(Config._fields) + METRICS
+    print(' '.join('{:>15}'.format(name) for name in names))
+    for i in order:
+        print(' '.join('{:>15.6g}'.format(columns[name][i]) for name in names))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Jumpy! parameter sweep')
+    parser.add_argument('--grid', nargs='+', default=[], metavar='NAME=A,B',
+                        help='全ての組み合わせを調べる値')
+    parser.add_argument('--random', type=int, default=0, metavar='N',
+                        help='範囲 (--range) からランダムに N 個選ぶ')
+    parser.add_argument('--range', nargs='+', default=[], metavar='NAME=LO:HI',
+                        dest='ranges', help='--random で選ぶ範囲')
+    parser.add_argument('--games', type=int, default=10,
+                        help='設定ごとに遊ぶ回数')
+    parser.add_argument('--minutes', type=float, default=5,
+                        help='1回のゲームの最大の長さ (ゲーム内の時間)')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='sweep.npz')
+    args = parser.parse_args()
+    # --random と --grid を両方使うと ランダムな設定ごとに grid の全てを調べる
+    try:
+        configs = [DEFAULT_CONFIG]
+        if args.random:
+            ranges = parse_specs(args.ranges, ':')
+            if any(len(v) != 2 for v in ranges.values()):
+                parser.error('--range は NAME=LO:HI')
+            configs = random_configs(ranges, args.random, args.seed)
+        configs = grid_configs(parse_specs(args.grid, ','), configs)
+    except ValueError as e:
+        parser.error(str(e))
+    steps = int(args.minutes * 60 * FPS)
+    start = time.perf_counter()
+    columns = sweep(configs, args.games, steps, args.workers, args.seed)
+    elapsed = time.perf_counter() - start
+    np.savez(args.out, games=args.games, steps=steps, **columns)
+    print('{} configs x {} games in {:.1f}s -> {}'.format(
+        len(configs), args.games, elapsed, args.out))
+    report(columns)
+
+
+if __name__ == '__main__':
+    main()
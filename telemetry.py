@@ -0,0 +1,333 @@
+# プレイの記録 (ジャンプ, 着地, POWERUP, 通り過ぎた platform, ゲームオーバー, フレームの時間)
+#
+# ゲームはイベントを RingBuffer に入れるだけで ファイルには書かない。
+# 別のスレッドが TELEMETRY_FLUSH 秒ごとに取り出して ブロックにまとめて書く。
+# RingBuffer がいっぱいのときは イベントを捨てる (ゲームは待たない)。
+# 捨てた数は ゲームの最後 (END のあと) に DROPPED で記録する。
+#
+# ファイル telemetry-<session>-<n>.jtl は ブロックを後ろに足していくだけ:
+#   BLOCK_HEADER (magic, version, イベントの数, 圧縮した長さ)
+#   zlib(列 run uint32, time uint32, kind uint8, value int64)  little endian
+# TELEMETRY_ROTATE を超えたら n を増やして次のファイルにする。
+# 最後のブロックが途中までしか書かれていなければ 読むときは無視する。
+#
+#   python telemetry.py [directory]    全てのゲームの集計を表示
+import os
+import struct
+import sys
+import threading
+import time
+import uuid
+import zlib
+from array import array
+from os import path
+
+from settings import *
+
+# イベントの種類 (value の意味)
+EVENTS = ['start',  # seed
+          'end',  # score
+          'jump',
+          'land',  # 着地した platform の高さ (最初の地面から pixel)
+          'boost',
+          'platform',  # 通り過ぎたあとの score
+          'death',  # CAUSES の番号
+          'frame',  # フレームの時間 (microsecond)
+          'dropped']  # 前の DROPPED から RingBuffer がいっぱいで捨てたイベントの数
+(START, END, JUMP, LAND, BOOST, PLATFORM, DEATH, FRAME,
+ DROPPED) = range(len(EVENTS))
+CAUSES = ['mob', 'fall']
+
+BLOCK_MAGIC = b'JTEL'
+BLOCK_VERSION = 1
+BLOCK_HEADER = struct.Struct('<4sBII')
+# 列の名前と array の型 (numpy では '<u4' などで読む)
+COLUMNS = [('run', 'I', '<u4'), ('time', 'I', '<u4'), ('kind', 'B', 'u1'),
+           ('value', 'q', '<i8')]
+
+
+class RingBuffer:
+    """ 1つのスレッドが push() し 1つのスレッドが drain() する 決まった大きさの列
+
+    ロックは使わない。push() は列に書いてから head を、drain() は読んでから
+    tail を進めるので 読んでいない場所が上書きされることはない。
+    最後の reserve 個の場所は ゲームの最後の END と DROPPED のために空けておく
+    """
+
+    def __init__(self, size=TELEMETRY_BUFFER, reserve=2):
+        self.size = size
+        self.reserve = reserve
+        self.run = array('I', bytes(4 * size))
+        self.time = array('I', bytes(4 * size))
+        self.kind = array('B', bytes(size))
+        self.value = array('q', bytes(8 * size))
+        self.head = 0  # push した数 (push するスレッドだけが変える)
+        self.tail = 0  # drain した数 (drain するスレッドだけが変える)
+        self.dropped = 0  # いっぱいで捨てた数
+
+    def push(self, run, time, kind, value, reserved=False):
+        """ イベントを1つ入れる (いっぱいで捨てたら False)
+
+        reserved=True なら reserve の場所も使う
+        """
+        head = self.head
+        if head - self.tail >= self.size - (0 if reserved else self.reserve):
+            self.dropped += 1
+            return False
+        i = head % self.size
+        self.run[i] = run
+        self.time[i] = time
+        self.kind[i] = kind
+        self.value[i] = value
+        self.head = head + 1
+        return True
+
+    def drain(self):
+        """ まだ読んでいないイベントを列ごとの array で返す """
+        tail = self.tail
+        head = self.head
+        columns = []
+        for column in (self.run, self.time, self.kind, self.value):
+            start = tail % self.size
+            stop = start + head - tail
+            if stop <= self.size:
+                columns.append(column[start:stop])
+            else:
+                columns.append(column[start:] + column[:stop - self.size])
+        self.tail = head
+        return columns
+
+
+def pack_block(columns):
+    """ 列 (array) を1つのブロックの bytes にする """
+    body = []
+    for column in columns:
+        if sys.byteorder == 'big':
+            column = array(column.typecode, column)
+            column.byteswap()
+        body.append(column.tobytes())
+    data = zlib.compress(b''.join(body))
+    return BLOCK_HEADER.pack(BLOCK_MAGIC, BLOCK_VERSION, len(columns[0]),
+                             len(data)) + data
+
+
+class Telemetry:
+    """ directory にプレイの記録を書く
+
+    start_run() で新しいゲームを始め、emit() でイベントを入れ、end_run() で終える。
+    close() で 残りを書いてスレッドを止める
+    """
+
+    def __init__(self, directory, size=TELEMETRY_BUFFER,
+                 flush=TELEMETRY_FLUSH, rotate=TELEMETRY_ROTATE):
+        self.directory = directory
+        self.ring = RingBuffer(size)
+        self.flush = flush
+        self.rotate = rotate
+        self.run = 0
+        self.reported = 0  # DROPPED で記録した 捨てたイベントの数
+        # 同じ session のファイルは 同じ Telemetry のゲーム (run は session の中の番号)
+        # 同じ秒に始まった session (同じプロセスでも) が混ざらないように uuid を付ける
+        self.session = '{}-{}-{}'.format(time.strftime('%Y%m%d-%H%M%S'),
+                                         os.getpid(), uuid.uuid4().hex[:8])
+        self.part = 0
+        self.file = None
+        self.stopped = threading.Event()
+        self.writer = threading.Thread(target=self.write_loop, daemon=True,
+                                       name='telemetry')
+        self.writer.start()
+
+    def start_run(self, seed, now=0):
+        self.run += 1
+        self.emit(START, now, seed)
+
+    def emit(self, kind, now, value=0):
+        self.ring.push(self.run, int(now), kind, value)
+
+    def end_run(self, now, score):
+        """ ゲームの最後: END と 前の DROPPED から捨てたイベントの数
+
+        DROPPED も捨てられたら その分は次のゲームの DROPPED に入る
+        """
+        ring = self.ring
+        ring.push(self.run, int(now), END, score, reserved=True)
+        dropped = ring.dropped - self.reported
+        if ring.push(self.run, int(now), DROPPED, dropped, reserved=True):
+            self.reported += dropped
+
+    def filename(self):
+        return path.join(self.directory, 'telemetry-{}-{}.jtl'.format(
+            self.session, self.part))
+
+    def write(self):
+        """ RingBuffer のイベントを1つのブロックにして書く (別のスレッド) """
+        columns = self.ring.drain()
+        if not columns[0]:
+            return
+        if self.file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self.file = open(self.filename(), 'ab')
+        self.file.write(pack_block(columns))
+        self.file.flush()
+        if self.file.tell() >= self.rotate:
+            self.file.close()
+            self.file = None
+            self.part += 1
+
+    def write_loop(self):
+        while not self.stopped.wait(self.flush):
+            self.write()
+        self.write()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def close(self):
+        """ 残りのイベントを書いて 書くスレッドを止める """
+        self.stopped.set()
+        self.writer.join()
+
+
+class NullTelemetry:
+    """ 記録しないとき (headless など) の Telemetry (何もしない) """
+
+    def start_run(self, seed, now=0):
+        pass
+
+    def emit(self, kind, now, value=0):
+        pass
+
+    def end_run(self, now, score):
+        pass
+
+    def close(self):
+        pass
+
+
+def read_blocks(filename):
+    """ ファイルのブロックを順番に bytes (展開したもの) で返す
+
+    途中までしか書かれていない最後のブロックは無視する
+    """
+    with open(filename, 'rb') as f:
+        data = f.read()
+    offset = 0
+    while offset + BLOCK_HEADER.size <= len(data):
+        magic, version, count, size = BLOCK_HEADER.unpack_from(data, offset)
+        if magic != BLOCK_MAGIC or version != BLOCK_VERSION:
+            raise ValueError('not a telemetry file: {}'.format(filename))
+        offset += BLOCK_HEADER.size
+        if offset + size > len(data):
+            return
+        yield count, zlib.decompress(data[offset:offset + size])
+        offset += size
+
+
+def load(directory):
+    """ directory の全ての .jtl を読んで 列 (名前 -> numpy 配列) を返す
+
+    run はゲームごとの番号 (0 から、session ごとに続けて付け直す)。
+    1つの session のイベントは書いた順番なので run は小さい順に並ぶ
+    """
+    # 読むときだけ numpy を使う (ゲームは numpy がなくても動く)
+    import numpy as np
+    sessions = {}  # session -> [(n, ファイル名)]
+    for name in os.listdir(directory):
+        if name.startswith('telemetry-') and name.endswith('.jtl'):
+            stem = name[len('telemetry-'):-len('.jtl')]
+            session, _, part = stem.rpartition('-')
+            sessions.setdefault(session, []).append((int(part), name))
+    parts = {column: [] for column, typecode, dtype in COLUMNS}
+    base = 0  # 前の session までのゲームの数
+    for session in sorted(sessions):
+        last = 0
+        for part, name in sorted(sessions[session]):
+            for count, data in read_blocks(path.join(directory, name)):
+                offset = 0
+                for column, typecode, dtype in COLUMNS:
+                    values = np.frombuffer(data, dtype, count, offset)
+                    offset += values.nbytes
+                    if column == 'run':
+                        last = max(last, int(values.max()))
+                        # run は 1 から始まる
+                        values = values.astype(np.int64) + (base - 1)
+                    parts[column].append(values)
+        base += last
+    return {column: (np.concatenate(parts[column]) if parts[column]
+                     else np.zeros(0, dtype))
+            for column, typecode, dtype in COLUMNS}
+
+
+def summarize(columns):
+    """ ゲームごとの集計 (名前 -> ゲームの数の長さの numpy 配列) とフレームの時間 """
+    import numpy as np
+    run = columns['run']
+    if np.any(run[1:] < run[:-1]):
+        order = np.argsort(run, kind='stable')
+        columns = {name: values[order] for name, values in columns.items()}
+        run = columns['run']
+    kind = columns['kind']
+    value = columns['value']
+    runs = int(run[-1]) + 1 if len(run) else 0
+
+    def count(k):
+        return np.bincount(run[kind == k], minlength=runs)
+
+    def last(k):
+        # ゲームごとの最後のイベントの value (なければ 0)
+        result = np.zeros(runs, dtype=np.int64)
+        mask = kind == k
+        result[run[mask]] = value[mask]
+        return result
+
+    # 時間はゲームの中では増えていくので 最後のイベントの時間が長さ
+    ends = np.searchsorted(run, np.arange(runs), side='right') - 1
+    events = np.bincount(run, minlength=runs)
+    duration = np.where(events > 0, columns['time'][ends], 0)
+    height = np.zeros(runs, dtype=np.int64)
+    mask = kind == LAND
+    np.maximum.at(height, run[mask], value[mask])
+    death = np.full(runs, -1, dtype=np.int64)
+    mask = kind == DEATH
+    death[run[mask]] = value[mask]
+    return {
+        'score': np.maximum(last(PLATFORM), last(END)),
+        'duration': duration / 1000,
+        'height': height,
+        'jumps': count(JUMP),
+        'landings': count(LAND),
+        'boosts': count(BOOST),
+        'platforms': count(PLATFORM),
+        'death': death,
+        'dropped': np.bincount(run[kind == DROPPED],
+                               value[kind == DROPPED], runs).astype(np.int64),
+        'frames': value[kind == FRAME] / 1000,
+    }
+
+
+if __name__ == '__main__':
+    import numpy as np
+    directory = sys.argv[1] if len(sys.argv) > 1 else (
+        TELEMETRY_DIR or path.join(path.dirname(path.abspath(__file__)),
+                                   'telemetry'))
+    began = time.perf_counter()
+    columns = load(directory)
+    stats = summarize(columns)
+    elapsed = time.perf_counter() - began
+    runs = len(stats['score'])
+    print('{} events, {} runs ({:.2f}s)'.format(len(columns['kind']), runs,
+                                               elapsed))
+    if runs:
+        for name in ['score', 'duration', 'height', 'jumps', 'landings',
+                     'boosts', 'platforms']:
+            values = stats[name]
+            print('{:<10} mean {:9.1f}  p50 {:9.1f}  max {:9.1f}'.format(
+                name, np.mean(values), np.median(values), np.max(values)))
+        deaths = np.bincount(stats['death'] + 1, minlength=len(CAUSES) + 1)
+        print('deaths    ', '  '.join('{} {}'.format(cause, n) for cause, n in
+                                      zip(['none'] + CAUSES, deaths)))
+        print('dropped    {} events'.format(stats['dropped'].sum()))
+    frames = stats['frames']
+    if len(frames):
+        print('frame ms   p50 {:.2f}  p95 {:.2f}  p99 {:.2f}  max {:.2f}'.format(
+            *np.percentile(frames, [50, 95, 99, 100])))